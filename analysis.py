@@ -0,0 +1,182 @@
+"""Article analysis for the News Genie application."""
+
+import functools
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+import anthropic
+
+from config import ANALYSIS_SETTINGS
+from utils import logger
+from store import get_store
+
+PROMPT = "Please analyze and summarize this news article: {content}"
+
+# Analyses being generated, keyed by content hash, so identical requests share one upstream call
+_analyses_in_flight = {}
+_analyses_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=ANALYSIS_SETTINGS['client_pool_size'])
+def get_client(api_key):
+    """Return the pooled API client for an API key, reusing its HTTP connections"""
+    return anthropic.Anthropic(api_key=api_key, base_url=ANALYSIS_SETTINGS['base_url'])
+
+def analyze_anthropic(api_key, content):
+    """Analyze an article with the Anthropic Messages API"""
+    message = get_client(api_key).messages.create(
+        model=ANALYSIS_SETTINGS['model'],
+        max_tokens=ANALYSIS_SETTINGS['max_tokens'],
+        messages=[
+            {
+                "role": "user",
+                "content": PROMPT.format(content=content)
+            }
+        ]
+    )
+    return ''.join(block.text for block in message.content if block.type == 'text')
+
+def stream_anthropic(api_key, content):
+    """Analyze an article with the Anthropic Messages API, yielding text as it is generated"""
+    with get_client(api_key).messages.stream(
+        model=ANALYSIS_SETTINGS['model'],
+        max_tokens=ANALYSIS_SETTINGS['max_tokens'],
+        messages=[
+            {
+                "role": "user",
+                "content": PROMPT.format(content=content)
+            }
+        ]
+    ) as stream:
+        yield from stream.text_stream
+
+def _stub_analysis(content):
+    """Build the placeholder analysis returned by the stub backend"""
+    words = content.split()
+    summary = ' '.join(words[:40])
+    if len(words) > 40:
+        summary += '...'
+    return f"Summary: {summary}\n\n({len(words)} words analyzed by the stub backend)"
+
+def analyze_stub(api_key, content):
+    """Return a deterministic placeholder analysis without calling any API"""
+    time.sleep(ANALYSIS_SETTINGS['stub_delay'])
+    return _stub_analysis(content)
+
+def stream_stub(api_key, content):
+    """Yield the stub analysis word by word, like a streaming API response"""
+    time.sleep(ANALYSIS_SETTINGS['stub_delay'])
+    for word in re.findall(r'\S+\s*', _stub_analysis(content)):
+        time.sleep(ANALYSIS_SETTINGS['stub_token_delay'])
+        yield word
+
+# Available analysis backends, selected by ANALYSIS_SETTINGS['backend'],
+# as (complete analysis, streamed analysis) functions
+BACKENDS = {
+    'anthropic': (analyze_anthropic, stream_anthropic),
+    'stub': (analyze_stub, stream_stub)
+}
+
+def content_hash(content):
+    """Hash article content together with the settings that shape its analysis"""
+    key = '\0'.join([
+        ANALYSIS_SETTINGS['backend'],
+        ANALYSIS_SETTINGS['model'],
+        str(ANALYSIS_SETTINGS['max_tokens']),
+        content.strip()
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _join_in_flight(digest):
+    """Return the in-flight analysis future for a hash and whether this caller must produce it"""
+    with _analyses_lock:
+        future = _analyses_in_flight.get(digest)
+        if future is not None:
+            return future, False
+        future = Future()
+        _analyses_in_flight[digest] = future
+        return future, True
+
+def _finish_in_flight(digest):
+    """Stop sharing the in-flight analysis for a hash"""
+    with _analyses_lock:
+        _analyses_in_flight.pop(digest, None)
+
+def analyze_content(api_key, content):
+    """Analyze article content, reusing stored and in-flight analyses of the same content.
+
+    Returns a tuple of (analysis, source), where source is 'cache' for a
+    stored analysis, 'coalesced' when the result was shared with a
+    concurrent identical request and 'upstream' for a new analysis.
+    Backend errors are raised to every request waiting on the call.
+    """
+    digest = content_hash(content)
+    store = get_store()
+    analysis = store.get_analysis(digest)
+    if analysis is not None:
+        logger.info(f"Serving stored analysis {digest[:12]}")
+        return analysis, 'cache'
+
+    future, leader = _join_in_flight(digest)
+    if not leader:
+        logger.info(f"Waiting for in-flight analysis {digest[:12]}")
+        return future.result(), 'coalesced'
+
+    try:
+        # Another request may have stored the analysis since the lookup above
+        analysis = store.get_analysis(digest)
+        source = 'cache'
+        if analysis is None:
+            analyze, _ = BACKENDS[ANALYSIS_SETTINGS['backend']]
+            analysis = analyze(api_key, content)
+            store.save_analysis(digest, ANALYSIS_SETTINGS['model'], analysis)
+            source = 'upstream'
+        future.set_result(analysis)
+        return analysis, source
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _finish_in_flight(digest)
+
+def stream_analysis(api_key, content):
+    """Analyze article content, yielding the text as the backend generates it.
+
+    Stored and in-flight analyses are reused as in analyze_content and are
+    yielded whole. The complete text is stored once the stream ends; if the
+    consumer stops reading early, nothing is stored and requests waiting on
+    this analysis get an error.
+    """
+    digest = content_hash(content)
+    store = get_store()
+    analysis = store.get_analysis(digest)
+    if analysis is not None:
+        logger.info(f"Serving stored analysis {digest[:12]}")
+        yield analysis
+        return
+
+    future, leader = _join_in_flight(digest)
+    if not leader:
+        logger.info(f"Waiting for in-flight analysis {digest[:12]}")
+        yield future.result()
+        return
+
+    try:
+        _, stream = BACKENDS[ANALYSIS_SETTINGS['backend']]
+        chunks = []
+        for chunk in stream(api_key, content):
+            chunks.append(chunk)
+            yield chunk
+        analysis = ''.join(chunks)
+        store.save_analysis(digest, ANALYSIS_SETTINGS['model'], analysis)
+        future.set_result(analysis)
+    except GeneratorExit:
+        future.set_exception(RuntimeError("Analysis was cancelled"))
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _finish_in_flight(digest)
@@ -1,13 +1,27 @@
 """Main application file for the News Genie application."""
 
-from flask import Flask, render_template, request, jsonify
-import anthropic
+import time
+
+# Measured from here to report cold start time
+_startup_began = time.perf_counter()
+
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+import json
 import os
+from urllib.parse import unquote
 
-from config import FLASK_DEBUG, FLASK_SECRET_KEY, PAGINATION, DATA_DIR, FEEDS_FILE
-from utils import logger, setup_nltk
+from config import FLASK_DEBUG, FLASK_SECRET_KEY, PAGINATION, DATA_DIR, FEEDS_FILE, SEARCH_SETTINGS, IMPORT_SETTINGS
+from utils import logger, find_missing_nltk_resources, preprocess_text
 from search import search_feeds
-from feed import get_feed_stories, add_feed, remove_feed, load_feeds, save_feeds
+from analysis import analyze_content, stream_analysis
+from ranking import RANKERS
+from cache import response_cache
+from feed import get_feed_stories, add_feed, remove_feed, load_feeds, set_feed_description, import_feeds
+from opml import parse_opml, build_opml
+from ingest import scheduler, start_scheduler
+from metrics import registry, request_profiler, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, REQUEST_STAGE_SECONDS
+from store import format_cursor
+from stream import story_stream
 
 # Print debug info about data file location
 print(f"DATA_DIR path: {DATA_DIR}")
@@ -15,14 +29,59 @@ print(f"FEEDS_FILE path: {FEEDS_FILE}")
 print(f"DATA_DIR exists: {os.path.exists(DATA_DIR)}")
 print(f"FEEDS_FILE exists: {os.path.exists(FEEDS_FILE)}")
 
+# Endpoints whose responses stay open; their duration says nothing about the work done
+STREAMING_ENDPOINTS = ('stream_stories',)
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = FLASK_SECRET_KEY
 
-# Setup NLTK data
-logger.info("Starting NLTK data download...")
-setup_nltk()
-logger.info("NLTK data download completed")
+# NLTK resources are loaded lazily on first use; they must be provisioned beforehand
+missing_nltk_resources = find_missing_nltk_resources()
+if missing_nltk_resources:
+    logger.warning(f"Missing NLTK resources: {', '.join(missing_nltk_resources)}. "
+                   "Run 'python provision.py' to install them.")
+
+# Start background feed ingestion
+start_scheduler()
+
+startup_timings = {
+    'import_seconds': time.perf_counter() - _startup_began,
+    'first_request_seconds': None
+}
+logger.info(f"Application initialized in {startup_timings['import_seconds']:.3f}s")
+
+@app.before_request
+def start_request_timer():
+    """Time the request and, if profiling is turned on, start sampling its stack"""
+    g.request_started = time.perf_counter()
+    if request_profiler is not None and request.endpoint not in STREAMING_ENDPOINTS:
+        request_profiler.start()
+
+@app.after_request
+def record_first_request(response):
+    """Record the time from process start to the first served request"""
+    if startup_timings['first_request_seconds'] is None:
+        startup_timings['first_request_seconds'] = time.perf_counter() - _startup_began
+        logger.info(f"First request served {startup_timings['first_request_seconds']:.3f}s after startup")
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and observe how long it took, by endpoint"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unknown'
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    """Stop sampling the request, keeping its profile if it was slow"""
+    started = g.get('request_started')
+    if request_profiler is not None and started is not None:
+        request_profiler.stop(f"{request.method} {request.full_path.rstrip('?')}", time.perf_counter() - started)
 
 @app.route('/')
 def index():
@@ -65,6 +124,48 @@ def add_new_feed():
         logger.error(f"Error adding feed: {str(e)}", exc_info=True)
         return jsonify({'error': 'Failed to add feed'}), 500
 
+@app.route('/api/feeds/import', methods=['POST'])
+def import_opml():
+    """Import feeds from an OPML file, uploaded as 'file' or sent as the request body"""
+    try:
+        upload = request.files.get('file')
+        content = upload.read() if upload is not None else request.get_data()
+        if not content:
+            logger.warning("Import request received with no OPML document")
+            return jsonify({'error': 'No OPML document provided'}), 400
+        
+        try:
+            candidates = parse_opml(content)
+        except ValueError as e:
+            logger.warning(f"Import request received with invalid OPML: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+        if len(candidates) > IMPORT_SETTINGS['max_feeds']:
+            return jsonify({'error': f"Too many feeds (at most {IMPORT_SETTINGS['max_feeds']} per import)"}), 400
+        
+        logger.info(f"Processing import of {len(candidates)} feeds")
+        reports = import_feeds(candidates)
+        counts = {}
+        for report in reports:
+            counts[report['status']] = counts.get(report['status'], 0) + 1
+        return jsonify({'feeds': reports, 'counts': counts, 'success': True})
+        
+    except Exception as e:
+        logger.error(f"Error importing feeds: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to import feeds'}), 500
+
+@app.route('/api/feeds/export', methods=['GET'])
+def export_opml():
+    """Export the saved feeds as an OPML file"""
+    try:
+        return Response(
+            build_opml(load_feeds()),
+            mimetype='text/x-opml',
+            headers={'Content-Disposition': 'attachment; filename=news-genie-feeds.opml'}
+        )
+    except Exception as e:
+        logger.error(f"Error exporting feeds: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to export feeds'}), 500
+
 @app.route('/api/feeds/<path:url>', methods=['DELETE'])
 def delete_feed(url):
     """Remove an RSS feed"""
@@ -91,37 +192,56 @@ def update_feed_description(url):
             return jsonify({'error': 'No JSON data provided'}), 400
             
         description = data.get('description', '')
+        success, message = set_feed_description(url, description)
         
-        # Load existing feeds
-        feeds = load_feeds()
-        
-        # Find and update the matching feed
-        found = False
-        for feed in feeds:
-            if feed['url'] == url:
-                feed['description'] = description
-                found = True
-                break
-                
-        if not found:
-            logger.warning(f"Feed not found for URL: '{url}'")
-            return jsonify({'error': 'Feed not found', 'success': False}), 404
-            
-        # Save the updated feeds
-        if save_feeds(feeds):
-            logger.info(f"Updated description for feed URL: '{url}'")
-            return jsonify({'message': 'Feed description updated successfully', 'success': True})
+        if success:
+            return jsonify({'message': message, 'success': True})
+        elif message == "Feed not found":
+            return jsonify({'error': message, 'success': False}), 404
         else:
-            logger.error(f"Failed to save feeds after updating description for '{url}'")
-            return jsonify({'error': 'Failed to save feed description', 'success': False}), 500
+            return jsonify({'error': message, 'success': False}), 500
             
     except Exception as e:
         logger.error(f"Error updating feed description: {str(e)}", exc_info=True)
         return jsonify({'error': 'Failed to update feed description'}), 500
 
+def cached_json_response(key, build, feed_urls=None):
+    """Serve a JSON response from the response cache, calling `build` for the payload on a miss.
+
+    `feed_urls` lists the feeds the payload is built from (None for every
+    feed). Responses carry an ETag; a request whose If-None-Match matches it
+    gets an empty 304.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation()
+        payload = build()
+        with REQUEST_STAGE_SECONDS.time(operation=key[0], stage='serialize'):
+            body = jsonify(payload).get_data()
+        entry = response_cache.put(key, body, generation, feed_urls)
+    
+    if request.if_none_match.contains(entry.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def parse_cursor(value):
+    """Parse a 'published_ts,feed_url,id' story cursor into its timeline key; returns None if it is malformed"""
+    parts = value.split(',', 2)
+    if len(parts) != 3:
+        return None
+    timestamp, feed_url, story_id = parts
+    try:
+        return float(timestamp), story_id, unquote(feed_url)
+    except ValueError:
+        return None
+
 @app.route('/api/stories', methods=['GET'])
 def get_stories():
-    """Get stories with pagination"""
+    """Get stories with pagination, by page number or by 'before' cursor"""
     try:
         page = request.args.get('page', PAGINATION['default_page'], type=int)
         items_per_page = request.args.get('items_per_page', PAGINATION['stories_per_page'], type=int)
@@ -130,29 +250,111 @@ def get_stories():
         feed_filter = request.args.get('feeds', '')
         selected_feeds = feed_filter.split(',') if feed_filter else []
         
+        # List one story per cluster of near-duplicates
+        collapse = request.args.get('collapse', '').lower() in ('1', 'true')
+        
+        before = None
+        before_param = request.args.get('before')
+        if before_param:
+            before = parse_cursor(before_param)
+            if before is None:
+                logger.warning(f"Stories request received with malformed cursor: '{before_param}'")
+                return jsonify({'error': "Cursor must be formatted as 'published_ts,id'"}), 400
+        
         if page < 1:
             page = 1
         if items_per_page < 1:
             items_per_page = PAGINATION['stories_per_page']
             
-        logger.info(f"Getting stories for page {page} with {items_per_page} items per page")
+        if before:
+            logger.debug(f"Getting {items_per_page} stories before cursor {before_param}")
+        else:
+            logger.debug(f"Getting stories for page {page} with {items_per_page} items per page")
         if selected_feeds:
-            logger.info(f"Filtering by feeds: {', '.join(selected_feeds)}")
+            logger.debug(f"Filtering by feeds: {', '.join(selected_feeds)}")
             
-        stories, total = get_feed_stories(page, items_per_page, selected_feeds)
+        def build():
+            stories, total, feed_status = get_feed_stories(page, items_per_page, selected_feeds, before, collapse)
+            return {
+                'stories': [story.to_dict() for story in stories],
+                'page': page,
+                'items_per_page': items_per_page,
+                'total': total,
+                'total_pages': (total + items_per_page - 1) // items_per_page,
+                'next_cursor': format_cursor(stories[-1]) if len(stories) == items_per_page else None,
+                'failed_feeds': feed_status['failed'],
+                'late_feeds': feed_status['late'],
+                'rate_limited_feeds': feed_status['rate_limited']
+            }
         
-        return jsonify({
-            'stories': stories,
-            'page': page,
-            'items_per_page': items_per_page,
-            'total': total,
-            'total_pages': (total + items_per_page - 1) // items_per_page
-        })
+        feed_set = tuple(sorted(set(selected_feeds)))
+        key = ('stories', page, items_per_page, feed_set, before, collapse)
+        return cached_json_response(key, build, feed_set or None)
         
     except Exception as e:
         logger.error(f"Error getting stories: {str(e)}", exc_info=True)
         return jsonify({'error': 'Failed to get stories'}), 500
 
+@app.route('/api/stories/stream', methods=['GET'])
+def stream_stories():
+    """Stream stories newer than the client's cursor as server-sent events as feeds are refreshed"""
+    feed_filter = request.args.get('feeds', '')
+    selected_feeds = feed_filter.split(',') if feed_filter else None
+    
+    # A reconnecting EventSource sends the ID of the last event it received
+    after_param = request.headers.get('Last-Event-ID') or request.args.get('after')
+    after = None
+    if after_param:
+        after = parse_cursor(after_param)
+        if after is None:
+            logger.warning(f"Story stream request received with malformed cursor: '{after_param}'")
+            return jsonify({'error': "Cursor must be formatted as 'published_ts,id'"}), 400
+    
+    subscription = story_stream.subscribe(selected_feeds, after)
+    if subscription is None:
+        logger.warning("Story stream request rejected: too many connected clients")
+        return jsonify({'error': 'Too many stream clients, try again later'}), 503
+    
+    return Response(
+        stream_with_context(story_stream.events(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    """Get startup timings, NLTK resource availability and response cache counters"""
+    return jsonify({
+        'startup': startup_timings,
+        'missing_nltk_resources': missing_nltk_resources,
+        'response_cache': response_cache.status()
+    })
+
+@app.route('/api/ingest/status', methods=['GET'])
+def ingest_status():
+    """Get the state of background feed ingestion"""
+    try:
+        return jsonify(scheduler.status())
+    except Exception as e:
+        logger.error(f"Error getting ingest status: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Failed to get ingest status'}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose stage timers and counters in the Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/profiles', methods=['GET'])
+def slow_request_profiles():
+    """Get the sampled stacks of the most recent slow requests"""
+    if request_profiler is None:
+        return jsonify({'enabled': False, 'profiles': []})
+    return jsonify({
+        'enabled': True,
+        'slow_request_seconds': request_profiler.slow_seconds,
+        'profiles': request_profiler.profiles()
+    })
+
 @app.route('/search', methods=['POST'])
 def search():
     """Handle search requests"""
@@ -167,18 +369,47 @@ def search():
             logger.warning("Search request received with empty keyword")
             return jsonify({'error': 'No keyword provided'}), 400
             
-        logger.info(f"Processing search request for keyword: '{keyword}'")
-        results = search_feeds(keyword)
-        logger.info(f"Search completed. Found {len(results)} results")
-        return jsonify({'results': results})
+        scorer = data.get('scorer')
+        if scorer and scorer not in RANKERS:
+            logger.warning(f"Search request received with unknown scorer: '{scorer}'")
+            return jsonify({'error': f"Unknown scorer '{scorer}'"}), 400
+            
+        collapse = bool(data.get('collapse'))
+        
+        logger.debug(f"Processing search request for keyword: '{keyword}'")
+        
+        def build():
+            results = search_feeds(keyword, scorer, collapse)
+            logger.debug(f"Search completed. Found {len(results)} results")
+            return {'results': [story.to_dict() for story in results]}
+        
+        # Keywords that normalize to the same tokens share a cached response
+        key = ('search', tuple(preprocess_text(keyword)), scorer or SEARCH_SETTINGS['scorer'], collapse)
+        return cached_json_response(key, build)
         
     except Exception as e:
         logger.error(f"Error in search endpoint: {str(e)}", exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
+def sse_event(data, event=None):
+    """Format one server-sent event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_analysis_events(api_key, content):
+    """Relay an article analysis as server-sent events: text chunks, then 'done' or 'error'"""
+    try:
+        for chunk in stream_analysis(api_key, content):
+            yield sse_event({'text': chunk})
+        logger.info("Streamed article analysis completed successfully")
+        yield sse_event({}, event='done')
+    except Exception as e:
+        logger.error(f"Error streaming article analysis: {str(e)}", exc_info=True)
+        yield sse_event({'error': str(e)}, event='error')
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
-    """Handle article analysis requests"""
+    """Handle article analysis requests, streamed as server-sent events when 'stream' is set"""
     data = request.json
     api_key = data.get('api_key', '')
     content = data.get('content', '')
@@ -187,24 +418,22 @@ def analyze():
         logger.warning("Analyze request received with missing API key or content")
         return jsonify({'error': 'API key and content are required'}), 400
     
+    if data.get('stream'):
+        logger.info("Processing streamed article analysis request")
+        return Response(
+            stream_with_context(stream_analysis_events(api_key, content)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     try:
         logger.info("Processing article analysis request")
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        message = client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=1000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Please analyze and summarize this news article: {content}"
-                }
-            ]
-        )
+        analysis, source = analyze_content(api_key, content)
         
-        logger.info("Article analysis completed successfully")
+        logger.info(f"Article analysis completed successfully ({source})")
         return jsonify({
-            'analysis': message.content
+            'analysis': analysis,
+            'source': source
         })
     
     except Exception as e:
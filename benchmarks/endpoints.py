@@ -0,0 +1,365 @@
+"""Load benchmark for the ingestion, story listing and search paths.
+
+Starts a local HTTP server in a separate process that serves synthetic RSS
+and Atom feeds, with a configurable size, latency and error rate, and runs
+the application against it with its own temporary feeds file and story
+store. Feeds are added through POST /api/feeds and refreshed while their
+entries change, then /api/stories and /search are driven through the Flask
+test client and preprocess_text is timed on feed entry text. Reports the
+latency percentiles, throughput and peak RSS of each phase as JSON, so runs
+can be compared over time.
+
+Usage (from the repository root):
+    python -m benchmarks.endpoints --feeds 50 --entries 40 --requests 500
+    python -m benchmarks.endpoints --latency 50 --error-rate 0.05 --output run.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is not reported there
+    resource = None
+
+# The application reads its settings when imported, so nothing that imports
+# config is imported at module level: main() first points it at a temporary
+# feeds file and story store.
+
+# Words the synthetic entries are made of (see benchmarks.html_text), combined into search keywords
+SEARCH_WORDS = ('model', 'training', 'startup', 'released', 'data', 'open-source', 'benchmark',
+                'researchers', 'GPU', 'inference', 'agents', 'Tuesday')
+
+# Publication time of the first entry of every feed; later entries follow 10 minutes apart
+FIRST_PUBLISHED = 1727784000
+
+def feed_path(index):
+    """Return the path a feed is served at; odd-numbered feeds are Atom"""
+    return f'/feed-{index}.atom' if index % 2 else f'/feed-{index}.xml'
+
+class FeedGenerator:
+    """Builds feed bodies as a window sliding over an endless sequence of entries.
+
+    At generation g a feed lists entries g * churn to g * churn + entries,
+    newest first, so every generation adds `churn` entries and drops as many.
+    The text of an entry depends only on the seed, its feed and its number.
+    """
+
+    def __init__(self, entries, paragraphs, churn, seed):
+        from benchmarks.html_text import random_entry, random_sentence
+        self._random_entry = random_entry
+        self._random_sentence = random_sentence
+        self.entries = entries
+        self.paragraphs = paragraphs
+        self.churn = churn
+        self.seed = seed
+
+    def entry(self, feed, number):
+        """Return the (title, description, content) of an entry"""
+        rng = random.Random(f'{self.seed}:{feed}:{number}')
+        return (self._random_sentence(rng), self._random_sentence(rng),
+                self._random_entry(rng, self.paragraphs))
+
+    def body(self, feed, generation):
+        """Return the body of a feed at a generation"""
+        first = generation * self.churn
+        numbers = range(first + self.entries - 1, first - 1, -1)
+        if feed % 2:
+            return self._atom(feed, numbers)
+        return self._rss(feed, numbers)
+
+    def _rss(self, feed, numbers):
+        items = []
+        for number in numbers:
+            title, description, content = self.entry(feed, number)
+            link = f'https://example.com/{feed}/{number}'
+            items.append(
+                f'<item><title>{escape(title)}</title><link>{link}</link><guid>{link}</guid>'
+                f'<pubDate>{formatdate(FIRST_PUBLISHED + number * 600, usegmt=True)}</pubDate>'
+                f'<description>{escape(description)}</description>'
+                f'<content:encoded>{escape(content)}</content:encoded></item>'
+            )
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+                f'<channel><title>Feed {feed}</title><link>https://example.com/{feed}</link>'
+                f'<description>Synthetic feed</description>{"".join(items)}</channel></rss>')
+
+    def _atom(self, feed, numbers):
+        entries = []
+        for number in numbers:
+            title, description, content = self.entry(feed, number)
+            link = f'https://example.com/{feed}/{number}'
+            updated = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(FIRST_PUBLISHED + number * 600))
+            entries.append(
+                f'<entry><title>{escape(title)}</title><link href="{link}"/><id>{link}</id>'
+                f'<updated>{updated}</updated><summary>{escape(description)}</summary>'
+                f'<content type="html">{escape(content)}</content></entry>'
+            )
+        return ('<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+                f'<title>Feed {feed}</title><id>https://example.com/{feed}</id>{"".join(entries)}</feed>')
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves the current generation of each feed, with ETags, latency and injected errors"""
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        name, _, extension = self.path.lstrip('/').partition('.')
+        if not name.startswith('feed-') or extension not in ('xml', 'atom'):
+            self.send_error(404)
+            return
+        if server.rng.random() < server.error_rate:
+            self.send_error(500)
+            return
+        try:
+            body, etag = server.bodies[(int(name[len('feed-'):]), server.generation.value)]
+        except (KeyError, ValueError):
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content_type = 'application/atom+xml' if extension == 'atom' else 'application/rss+xml'
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_feeds(generator_args, feeds, generations, latency, error_rate, seed, generation, port_queue):
+    """Run the feed server until the process is terminated; its port is put on `port_queue`.
+
+    Every body is built before the server starts, so generating them does not
+    add to the measured fetch times.
+    """
+    generator = FeedGenerator(*generator_args)
+    bodies = {}
+    for feed in range(feeds):
+        for current in range(generations):
+            bodies[(feed, current)] = (generator.body(feed, current).encode('utf-8'), f'"{feed}-{current}"')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.daemon_threads = True
+    server.bodies = bodies
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.generation = generation
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+def peak_rss_mib():
+    """Return the peak resident set size of this process so far, in MiB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+def percentile(latencies, percent):
+    """Return the nearest-rank percentile of sorted latencies"""
+    return latencies[max(0, math.ceil(percent / 100 * len(latencies)) - 1)]
+
+def time_calls(calls, concurrency):
+    """Run calls on `concurrency` threads, each returning whether it succeeded.
+
+    Returns the (seconds, succeeded) result of every call and the elapsed time.
+    """
+    def timed(call):
+        start = time.perf_counter()
+        succeeded = call()
+        return time.perf_counter() - start, succeeded
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, calls))
+    else:
+        results = list(map(timed, calls))
+    return results, time.perf_counter() - start
+
+def phase_report(results, elapsed):
+    """Summarize the timed calls of a phase"""
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, succeeded in results if not succeeded),
+        'seconds': round(elapsed, 3),
+        'throughput_per_sec': round(len(results) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3)
+        } if latencies else None,
+        'peak_rss_mib': peak_rss_mib()
+    }
+
+def run_phase(calls, concurrency):
+    """Time calls and return the phase report"""
+    return phase_report(*time_calls(calls, concurrency))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feeds', type=int, default=50)
+    parser.add_argument('--entries', type=int, default=40, help='Entries per feed')
+    parser.add_argument('--paragraphs', type=int, default=8, help='Paragraphs per entry; sets the body size')
+    parser.add_argument('--latency', type=float, default=0, help='Milliseconds the feed server waits per response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of feed responses that fail with a 500')
+    parser.add_argument('--churn', type=int, default=2, help='New entries per feed on each refresh round')
+    parser.add_argument('--refresh-rounds', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=500, help='Requests to /api/stories and to /search')
+    parser.add_argument('--texts', type=int, default=500, help='Entries whose text preprocess_text is timed on')
+    parser.add_argument('--concurrency', type=int, default=1, help='Threads issuing requests at once')
+    parser.add_argument('--scorer', help='Search ranking engine; the configured default if not given')
+    parser.add_argument('--cache', action='store_true', help='Keep the response cache enabled')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    data_dir = tempfile.TemporaryDirectory(prefix='news-genie-bench-')
+    os.environ['FEEDS_FILE'] = os.path.join(data_dir.name, 'feeds.json')
+    os.environ['STORE_FILE'] = os.path.join(data_dir.name, 'stories.db')
+    os.environ['INGEST_ENABLED'] = 'false'
+    os.environ['SUMMARY_ENABLED'] = 'false'
+    os.environ['CACHE_ENABLED'] = 'true' if args.cache else 'false'
+
+    context = multiprocessing.get_context('spawn')
+    generation = context.Value('i', 0)
+    port_queue = context.Queue()
+    generator_args = (args.entries, args.paragraphs, args.churn, args.seed)
+    server = context.Process(
+        target=serve_feeds,
+        args=(generator_args, args.feeds, args.refresh_rounds + 1, args.latency / 1000, args.error_rate,
+              args.seed, generation, port_queue),
+        daemon=True
+    )
+    server.start()
+
+    # The application prints its data file locations on import; stdout is kept for the report
+    with redirect_stdout(sys.stderr):
+        import app
+        from config import PARSE_SETTINGS, SEARCH_SETTINGS
+        from feed import get_feed, refresh_feed
+        from parsing import parse_stage
+        from utils import preprocess_text
+    logging.getLogger('utils').setLevel(logging.WARNING)
+
+    try:
+        port = port_queue.get(timeout=600)
+        feed_urls = [f'http://127.0.0.1:{port}{feed_path(index)}' for index in range(args.feeds)]
+        rng = random.Random(args.seed)
+        clients = threading.local()
+
+        def client():
+            if not hasattr(clients, 'client'):
+                clients.client = app.app.test_client()
+            return clients.client
+
+        def add(url):
+            return lambda: client().post('/api/feeds', json={'url': url}).status_code == 200
+
+        def refresh(url):
+            return lambda: refresh_feed(get_feed(url))
+
+        def list_stories(params):
+            return lambda: client().get('/api/stories', query_string=params).status_code == 200
+
+        def search(body):
+            return lambda: client().post('/search', json=body).status_code == 200
+
+        phases = {}
+        phases['add_feed'] = run_phase([add(url) for url in feed_urls], args.concurrency)
+
+        added = [url for url in feed_urls if get_feed(url) is not None]
+        # Each round moves every feed on by a generation, so refreshes find new and dropped entries
+        refreshes, elapsed = [], 0.0
+        for _ in range(args.refresh_rounds):
+            with generation.get_lock():
+                generation.value += 1
+            results, seconds = time_calls([refresh(url) for url in added], args.concurrency)
+            refreshes += results
+            elapsed += seconds
+        phases['refresh_feed'] = phase_report(refreshes, elapsed)
+
+        story_requests = []
+        for _ in range(args.requests):
+            params = {'page': rng.randint(1, 5)}
+            roll = rng.random()
+            if roll < 0.3 and added:
+                params['feeds'] = ','.join(rng.sample(added, min(len(added), rng.randint(1, 3))))
+            elif roll < 0.4:
+                params['collapse'] = '1'
+            story_requests.append(params)
+        phases['stories'] = run_phase([list_stories(params) for params in story_requests], args.concurrency)
+
+        search_requests = []
+        for _ in range(args.requests):
+            body = {'keyword': ' '.join(rng.sample(SEARCH_WORDS, rng.randint(1, 2)))}
+            if args.scorer:
+                body['scorer'] = args.scorer
+            search_requests.append(body)
+        phases['search'] = run_phase([search(body) for body in search_requests], args.concurrency)
+
+        generator = FeedGenerator(*generator_args)
+        texts = [text for number in range(args.texts)
+                 for text in generator.entry(number % max(args.feeds, 1), number)]
+        phases['preprocess_text'] = run_phase(
+            [lambda text=text: preprocess_text(text) is not None for text in texts], 1
+        )
+
+        total = client().get('/api/stories', query_string={'items_per_page': 1}).get_json().get('total')
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'parse_mode': PARSE_SETTINGS['mode'],
+                'scorer': args.scorer or SEARCH_SETTINGS['scorer'],
+                'tokenizer': SEARCH_SETTINGS['tokenizer']
+            },
+            'config': {key: value for key, value in vars(args).items() if key != 'output'},
+            'mean_feed_bytes': sum(len(generator.body(index, 0).encode('utf-8'))
+                                   for index in range(min(args.feeds, 10))) // max(min(args.feeds, 10), 1),
+            'feeds_added': len(added),
+            'stories_stored': total,
+            'phases': phases,
+            'peak_rss_mib': peak_rss_mib()
+        }
+    finally:
+        parse_stage.shutdown()
+        server.terminate()
+        server.join()
+        data_dir.cleanup()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Equivalence check and benchmark for the HTML-to-text extractor.
+
+Generates synthetic full-text feed entries, reduces each to text with
+BeautifulSoup (the previous process_entry path) and with utils.html_to_text,
+reports any entry whose text differs, and times both.
+
+Usage (from the repository root):
+    python -m benchmarks.html_text --entries 500 --paragraphs 20
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from utils import html_to_text, strip_html
+
+WORDS = ('model', 'training', 'the', 'AI', 'startup', 'released', 'data', 'open-source', 'benchmark',
+         'researchers', "company's", 'GPU', 'inference', 'agents', 'said', 'on', 'Tuesday', 'U.S.')
+
+def random_sentence(rng):
+    """Return a sentence with occasional inline markup and character references"""
+    words = []
+    for _ in range(rng.randint(6, 18)):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f'<a href="https://example.com/{word}">{word}</a>'
+        elif roll < 0.1:
+            word = f'<strong>{word}</strong>'
+        elif roll < 0.13:
+            word = rng.choice(['&amp;', '&#8217;s', '&nbsp;', '&mdash;', '&lt;b&gt;'])
+        words.append(word)
+    return ' '.join(words).capitalize() + '.'
+
+def random_entry(rng, paragraphs):
+    """Return the HTML body of a synthetic full-text article"""
+    parts = ['<div class="entry-content">']
+    for index in range(paragraphs):
+        if index and index % 7 == 0:
+            parts.append('<figure><img src="https://example.com/image.jpg" alt="chart"/>'
+                         '<figcaption>Chart &copy; Example</figcaption></figure>')
+        if index and index % 11 == 0:
+            parts.append('<script type="text/javascript">window.ads = window.ads || [];</script>')
+        parts.append('<p>' + ' '.join(random_sentence(rng) for _ in range(rng.randint(2, 5))) + '</p>\n')
+    parts.append('<!-- end of article --></div>')
+    return ''.join(parts)
+
+def time_per_entry(function, entries):
+    """Return the entries per second a text extraction function handles"""
+    start = time.perf_counter()
+    for entry in entries:
+        function(entry)
+    return len(entries) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=500)
+    parser.add_argument('--paragraphs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = [random_entry(rng, args.paragraphs) for _ in range(args.entries)]
+
+    mismatches = 0
+    for entry in entries:
+        soup = BeautifulSoup(entry, 'html.parser')
+        if html_to_text(entry) != soup.get_text():
+            mismatches += 1
+        elif strip_html(entry) != soup.get_text(separator=' ', strip=True):
+            mismatches += 1
+
+    timings = {
+        'beautifulsoup': time_per_entry(lambda entry: BeautifulSoup(entry, 'html.parser').get_text(), entries),
+        'html_to_text': time_per_entry(html_to_text, entries)
+    }
+
+    print(json.dumps({
+        'entries': args.entries,
+        'mean_entry_bytes': sum(len(entry) for entry in entries) // len(entries),
+        'mismatches': mismatches,
+        'entries_per_sec': timings,
+        'speedup': timings['html_to_text'] / timings['beautifulsoup']
+    }, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Throughput benchmark for the feed parse stage in each execution mode.
+
+Builds synthetic RSS bodies with full-text entries and parses them from
+several threads at once, as concurrent feed refreshes do, with the parse
+stage running inline, on threads and on worker processes. Reports feeds
+per second for each mode and checks that every mode yields the same
+entries and tokens.
+
+Usage (from the repository root):
+    python -m benchmarks.parse_stage --feeds 64 --entries 50 --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from benchmarks.html_text import random_entry, random_sentence
+from parsing import PARSE_MODES, ParseStage
+
+def random_feed(rng, name, entries, paragraphs):
+    """Return the body of a synthetic RSS feed"""
+    items = []
+    for index in range(entries):
+        items.append(
+            f'<item><title>{escape(random_sentence(rng))}</title>'
+            f'<link>https://example.com/{name}/{index}</link><guid>{name}-{index}</guid>'
+            f'<pubDate>Tue, 0{1 + index % 9} Oct 2024 12:00:00 GMT</pubDate>'
+            f'<description>{escape(random_sentence(rng))}</description>'
+            f'<content:encoded>{escape(random_entry(rng, paragraphs))}</content:encoded></item>'
+        )
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+            f'<channel><title>{name}</title><link>https://example.com/{name}</link>'
+            f'<description>Synthetic feed</description>{"".join(items)}</channel></rss>')
+
+def run_mode(mode, feeds, workers, chunk_size):
+    """Parse every feed through a parse stage in the given mode; returns (feeds per second, results)"""
+    stage = ParseStage(mode, workers, chunk_size)
+    try:
+        # Start the pool before timing so worker startup is not measured
+        stage.parse('warmup', 'warmup', feeds[0][1])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as fetchers:
+            results = list(fetchers.map(lambda feed: stage.parse(feed[0], '', feed[1]), feeds))
+        elapsed = time.perf_counter() - start
+    finally:
+        stage.shutdown()
+    return len(feeds) / elapsed, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feeds', type=int, default=64)
+    parser.add_argument('--entries', type=int, default=50, help='Entries per feed')
+    parser.add_argument('--paragraphs', type=int, default=8, help='Paragraphs per entry')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    feeds = [(f'https://example.com/feed-{i}.xml', random_feed(rng, f'feed-{i}', args.entries, args.paragraphs))
+             for i in range(args.feeds)]
+
+    throughput = {}
+    reference = None
+    mismatches = 0
+    for mode in PARSE_MODES:
+        throughput[mode], results = run_mode(mode, feeds, args.workers, args.chunk_size)
+        if reference is None:
+            reference = results
+        elif results != reference:
+            mismatches += 1
+
+    print(json.dumps({
+        'feeds': args.feeds,
+        'entries_per_feed': args.entries,
+        'mean_feed_bytes': sum(len(body) for _, body in feeds) // len(feeds),
+        'workers': args.workers,
+        'mismatched_modes': mismatches,
+        'feeds_per_sec': throughput,
+        'process_speedup': throughput['process'] / throughput['inline']
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Throughput benchmark for the search ranking engines.
+
+Builds an inverted index over synthetic pre-tokenized documents and runs the
+same random queries through every ranker in ranking.RANKERS.
+
+Usage (from the repository root):
+    python -m benchmarks.scorers --docs 20000 --queries 200
+"""
+
+import argparse
+import json
+import random
+import time
+
+from index import InvertedIndex, INDEXED_FIELDS
+from ranking import RANKERS
+
+FIELD_LENGTHS = {'title': 10, 'description': 40, 'content': 300}
+
+def build_index(doc_count, vocabulary_size, seed):
+    """Index synthetic documents whose terms follow a Zipf-like distribution"""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    index = InvertedIndex()
+    for doc_id in range(doc_count):
+        field_tokens = {
+            field: rng.choices(vocabulary, weights, k=rng.randint(length // 2, length))
+            for field, length in FIELD_LENGTHS.items()
+        }
+        index.add_tokens(doc_id, {'feed_url': f"feed{doc_id % 50}", 'published_ts': 0.0}, field_tokens)
+    return index, vocabulary
+
+def run(doc_count, query_count, vocabulary_size, seed):
+    """Time every ranker on the same queries and return queries/sec per ranker"""
+    index, vocabulary = build_index(doc_count, vocabulary_size, seed)
+    rng = random.Random(seed + 1)
+    # Query terms are drawn from the mid-frequency band, like real keywords
+    queries = [rng.sample(vocabulary[20:500], rng.randint(1, 3)) for _ in range(query_count)]
+
+    results = {}
+    for name, rank in RANKERS.items():
+        candidate_total = 0
+        start = time.perf_counter()
+        for keyword_tokens in queries:
+            term_postings = {term: index.postings(term) for term in dict.fromkeys(keyword_tokens)}
+            candidates = set()
+            for postings in term_postings.values():
+                candidates.update(postings)
+            candidate_total += len(candidates)
+            rank(index, candidates, term_postings, keyword_tokens)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'queries_per_sec': query_count / elapsed,
+            'mean_candidates': candidate_total / query_count
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = run(args.docs, args.queries, args.vocabulary, args.seed)
+    print(json.dumps({'docs': args.docs, 'queries': args.queries, 'fields': INDEXED_FIELDS,
+                      'scorers': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Memory benchmark for story records and index document metadata.
+
+Builds the same synthetic stories as plain dicts (the previous
+representation) and as store.Story records, with and without their
+content loaded, plus the per-document metadata the search index keeps,
+and reports the memory each takes per 100k stories.
+
+Usage (from the repository root):
+    python -m benchmarks.story_memory --stories 100000 --feeds 200
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from benchmarks.html_text import random_sentence
+from index import IndexedDocument
+from store import STORY_FIELDS, Story, _UNLOADED
+
+def story_values(rng, feeds):
+    """Yield the field values of synthetic stories, as read from the store"""
+    index = 0
+    while True:
+        feed = index % feeds
+        feed_url = f'https://example.com/feed-{feed}.xml'
+        yield {
+            'rowid': index + 1,
+            'id': f'https://example.com/{feed}/{index}',
+            'title': random_sentence(rng),
+            'link': f'https://example.com/{feed}/{index}',
+            'description': random_sentence(rng),
+            'content': ' '.join(random_sentence(rng) for _ in range(8)),
+            'published': 'Tue, 01 Oct 2024 12:00:00 GMT',
+            'published_ts': 1727784000.0 + index,
+            'source': f'Feed {feed}',
+            'feed_url': feed_url,
+            'cluster_id': f'{index:016x}'
+        }
+        index += 1
+
+def as_dict(values):
+    """Previous representation: one dict per story"""
+    return {field: values[field] for field in STORY_FIELDS}
+
+def as_story(values):
+    """Story record with its content"""
+    return Story(*(values[field] for field in STORY_FIELDS), rowid=values['rowid'])
+
+def as_listing_story(values):
+    """Story record read for a listing, its content left in the store"""
+    story = as_story(values)
+    story.content = _UNLOADED
+    return story
+
+def as_index_dict(values):
+    """Previous index document metadata: a dict with a lengths dict and a term set"""
+    return {'feed_url': values['feed_url'], 'published_ts': values['published_ts'],
+            'cluster_id': values['cluster_id'], 'lengths': {'title': 9, 'description': 9, 'content': 70},
+            'terms': set(values['title'].lower().split())}
+
+def as_index_document(values):
+    """Index document metadata as an IndexedDocument"""
+    return IndexedDocument(values['feed_url'], values['published_ts'], values['cluster_id'], (9, 9, 70),
+                           tuple(set(values['title'].lower().split())))
+
+def copy_rows(rows):
+    """Copy rows with new string objects, as a fresh read from the store would return"""
+    return [{field: (value[:1] + value[1:] if isinstance(value, str) else value)
+             for field, value in row.items()} for row in rows]
+
+def measure(build, rows):
+    """Return the bytes retained by one object built per row, including the strings it keeps"""
+    gc.collect()
+    tracemalloc.start()
+    copies = copy_rows(rows)
+    objects = [build(values) for values in copies]
+    del copies
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stories', type=int, default=100000)
+    parser.add_argument('--feeds', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    values = story_values(random.Random(args.seed), args.feeds)
+    rows = [next(values) for _ in range(args.stories)]
+    scale = 100000 / args.stories
+
+    results = {}
+    for name, build in [('story_dict', as_dict), ('story_record', as_story),
+                        ('story_record_without_content', as_listing_story),
+                        ('index_dict', as_index_dict), ('index_document', as_index_document)]:
+        results[name] = round(measure(build, rows) * scale / 2 ** 20, 1)
+
+    print(json.dumps({
+        'stories': args.stories,
+        'feeds': args.feeds,
+        'mib_per_100k': results,
+        'story_saving': round(1 - results['story_record'] / results['story_dict'], 3),
+        'index_saving': round(1 - results['index_document'] / results['index_dict'], 3)
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Equivalence check and benchmark for the fast preprocess_text tokenizer.
+
+Runs every line of tokenizer_corpus.txt through preprocess_text with the
+'nltk' and 'fast' tokenizers, reports any line whose tokens differ, and
+times both modes. Requires the NLTK stopwords and punkt data.
+
+Usage (from the repository root):
+    python -m benchmarks.tokenizer --repeat 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import utils
+from config import SEARCH_SETTINGS
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tokenizer_corpus.txt')
+
+def load_corpus():
+    """Return the lines of the agreed tokenizer corpus"""
+    with open(CORPUS_FILE, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+def tokenize_all(texts, mode):
+    """Preprocess every text with the given tokenizer mode"""
+    SEARCH_SETTINGS['tokenizer'] = mode
+    return utils.preprocess_texts(texts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help='Times the corpus is repeated for timing')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    original_mode = SEARCH_SETTINGS['tokenizer']
+    try:
+        expected = tokenize_all(corpus, 'nltk')
+        actual = tokenize_all(corpus, 'fast')
+        mismatches = [
+            {'text': text, 'nltk': want, 'fast': got}
+            for text, want, got in zip(corpus, expected, actual) if want != got
+        ]
+
+        timings = {}
+        texts = corpus * args.repeat
+        for mode in ('nltk', 'fast'):
+            start = time.perf_counter()
+            tokenize_all(texts, mode)
+            timings[mode] = len(texts) / (time.perf_counter() - start)
+    finally:
+        SEARCH_SETTINGS['tokenizer'] = original_mode
+
+    print(json.dumps({
+        'corpus_lines': len(corpus),
+        'mismatches': mismatches,
+        'texts_per_sec': timings
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
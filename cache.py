@@ -0,0 +1,101 @@
+"""Response cache for the News Genie application."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_SETTINGS
+from utils import logger
+
+class CachedResponse:
+    """A serialized response body and its entity tag"""
+
+    def __init__(self, body, expires, feed_urls):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.expires = expires
+        self.feed_urls = feed_urls
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized API responses with a TTL.
+
+    Each entry records the feed URLs its response was built from, or None
+    when it covers every subscribed feed, so that it is dropped as soon as
+    one of those feeds changes. Responses computed while an invalidation
+    happened are not stored, since they may already be stale.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def generation(self):
+        """Return a token to pass to put() for a response about to be computed"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        """Return the cached response for a key, or None if it is missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def put(self, key, body, generation, feed_urls=None):
+        """Cache a response body built from `feed_urls` (None for every feed).
+
+        Returns the new entry, which is only stored if nothing was
+        invalidated since `generation` was taken.
+        """
+        entry = CachedResponse(body, time.monotonic() + self.ttl,
+                               frozenset(feed_urls) if feed_urls is not None else None)
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_feed(self, feed_url):
+        """Drop every response that includes stories or status of a feed"""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items()
+                     if entry.feed_urls is None or feed_url in entry.feed_urls]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += len(stale)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached responses for feed {feed_url}")
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+
+    def status(self):
+        """Return the entry count and hit, miss and invalidation counters"""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+# Shared cache for the story and search endpoints; with caching disabled
+# nothing is kept, but responses still carry an ETag
+response_cache = ResponseCache(CACHE_SETTINGS['max_entries'] if CACHE_SETTINGS['enabled'] else 0,
+                               CACHE_SETTINGS['ttl'])
@@ -13,7 +13,8 @@ FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 
 # File paths
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
-FEEDS_FILE = os.path.join(DATA_DIR, 'feeds.json')
+FEEDS_FILE = os.getenv('FEEDS_FILE', os.path.join(DATA_DIR, 'feeds.json'))
+STORE_FILE = os.getenv('STORE_FILE', os.path.join(DATA_DIR, 'stories.db'))
 
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -28,9 +29,65 @@ REQUEST_SETTINGS = {
     'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
-# Rate limiting settings
+# Feed fetching settings
+FETCH_SETTINGS = {
+    'max_workers': int(os.getenv('FETCH_MAX_WORKERS', '8')),   # Feeds fetched in parallel
+    'deadline': float(os.getenv('FETCH_DEADLINE', '15')),      # Seconds a request waits for feeds before responding
+    'sniff_chunk_size': 1024,                                   # Bytes fed at a time when checking a body's root element
+    'sniff_limit': 8192                                         # Bytes read for the root element before a body is rejected
+}
+
+# Bulk feed import settings
+IMPORT_SETTINGS = {
+    'max_workers': int(os.getenv('IMPORT_MAX_WORKERS', '8')),  # Imported feeds validated in parallel
+    'max_feeds': int(os.getenv('IMPORT_MAX_FEEDS', '1000'))    # Largest feed list accepted in one import
+}
+
+# Feed parsing and tokenization settings
+PARSE_SETTINGS = {
+    'mode': os.getenv('PARSE_MODE', 'inline'),    # 'inline' (in the fetching thread), 'thread' or 'process'
+    'workers': int(os.getenv('PARSE_WORKERS', '0')) or os.cpu_count() or 1,  # Pool size; defaults to one per core
+    'chunk_size': int(os.getenv('PARSE_CHUNK_SIZE', '64')),  # Stored stories tokenized per worker task
+    'start_method': os.getenv('PARSE_START_METHOD', 'spawn')  # How worker processes are started
+}
+
+# Background ingestion settings
+INGEST_SETTINGS = {
+    'enabled': os.getenv('INGEST_ENABLED', 'True').lower() == 'true',  # Poll feeds in a background thread
+    'refresh_interval': int(os.getenv('INGEST_REFRESH_INTERVAL', '900')),  # Default seconds between refreshes of a feed
+    'tick': 5,                                                         # Seconds between scheduler checks for due feeds
+    'retention': int(os.getenv('INGEST_RETENTION', '604800')),         # Seconds a story is kept after leaving its feed
+    'max_stories_per_feed': int(os.getenv('INGEST_MAX_STORIES_PER_FEED', '500'))  # Stories past this that left the feed are expired early
+}
+
+# Live story stream settings for /api/stories/stream
+STREAM_SETTINGS = {
+    'max_clients': int(os.getenv('STREAM_MAX_CLIENTS', '100')),  # Connected clients; each holds a server thread
+    'queue_size': int(os.getenv('STREAM_QUEUE_SIZE', '100')),  # Refresh batches a client may fall behind before it is disconnected
+    'keepalive': 15,         # Seconds between keepalive comments on an idle stream
+    'catch_up_limit': int(os.getenv('STREAM_CATCH_UP_LIMIT', '100')),  # Stories sent on connect; past this the client reloads its timeline
+    'reconnect_delay': 3     # Seconds a disconnected client waits before reconnecting
+}
+
+# Response cache settings for /api/stories and /search
+CACHE_SETTINGS = {
+    'enabled': os.getenv('CACHE_ENABLED', 'True').lower() == 'true',
+    'max_entries': int(os.getenv('CACHE_MAX_ENTRIES', '256')),  # Least recently used responses are evicted first
+    'ttl': int(os.getenv('CACHE_TTL', '30'))                    # Seconds a response is served without recomputing
+}
+
+# Rate limiting settings, keyed by host pattern: an exact host, a parent domain
+# ('yahoo.com') or a single domain label ('yahoo' matches any *.yahoo.* host)
 RATE_LIMIT = {
-    'yahoo': {'last_request': None, 'min_interval': 60},  # 60 seconds between requests
+    'yahoo': {'min_interval': 60, 'burst': 1},  # 60 seconds between requests
+}
+
+# Metrics and request profiling settings
+METRICS_SETTINGS = {
+    'profiler': os.getenv('PROFILER_ENABLED', 'False').lower() == 'true',  # Sample the stacks of requests as they run
+    'profile_interval': float(os.getenv('PROFILER_INTERVAL', '0.005')),    # Seconds between stack samples
+    'slow_request_seconds': float(os.getenv('SLOW_REQUEST_SECONDS', '1.0')),  # Requests this slow keep their profile
+    'profiles_kept': 20                                                   # Most recent slow-request profiles kept
 }
 
 # Pagination settings
@@ -45,13 +102,56 @@ SEARCH_SETTINGS = {
     'description_weight': 1.0,   # Description matches are medium importance
     'content_weight': 0.5,       # Content matches are least important
     'min_relevance_score': 3.0,  # Minimum score required for a result to be included
-    'max_results': 10            # Maximum number of results to return
+    'max_results': 10,           # Maximum number of results to return
+    'scorer': os.getenv('SEARCH_SCORER', 'classic'),  # Ranking engine: 'classic' or 'bm25'
+    'tokenizer': os.getenv('SEARCH_TOKENIZER', 'fast'),  # Text tokenizer: 'fast' or 'nltk'
+    'bm25_k1': 1.2,              # BM25 term frequency saturation
+    'bm25_b': 0.75,              # BM25 field length normalization
+    'bm25_min_score_ratio': 0.1  # Fraction of the best BM25 score a result needs to be included
+}
+
+# Near-duplicate story detection settings
+DEDUPE_SETTINGS = {
+    'enabled': os.getenv('DEDUPE_ENABLED', 'True').lower() == 'true',
+    'num_perm': 128,     # MinHash signature length
+    'bands': 16,         # LSH bands (num_perm / bands rows each); more bands find less similar pairs
+    'threshold': 0.7,    # Estimated Jaccard similarity at which stories are treated as duplicates
+    'shingle_size': 3    # Tokens per shingle
+}
+
+# Article analysis settings
+ANALYSIS_SETTINGS = {
+    'backend': os.getenv('ANALYSIS_BACKEND', 'anthropic'),     # 'anthropic', or 'stub' to work offline
+    'model': os.getenv('ANALYSIS_MODEL', 'claude-3-opus-20240229'),
+    'max_tokens': 1000,
+    'base_url': os.getenv('ANTHROPIC_BASE_URL') or None,        # Alternative API endpoint, e.g. a local mock server
+    'client_pool_size': 32,                                     # API clients kept for reuse, one per API key
+    'stub_delay': float(os.getenv('ANALYSIS_STUB_DELAY', '0')),  # Seconds before the stub backend answers
+    'stub_token_delay': 0.02                                     # Seconds between words streamed by the stub backend
+}
+
+# Background summarization of newly ingested stories
+SUMMARY_SETTINGS = {
+    'enabled': os.getenv('SUMMARY_ENABLED', 'False').lower() == 'true',
+    'api_key': os.getenv('ANTHROPIC_API_KEY', ''),                    # Key used for background analyses
+    'workers': int(os.getenv('SUMMARY_WORKERS', '2')),                # Concurrent backend calls
+    'queue_size': 1000,                                               # Stories waiting beyond this are skipped
+    'retry_backlog': 100,                                             # Skipped stories kept per feed for its next refresh
+    'max_retries': 3,                                                 # Retries of a failed analysis
+    'backoff': 2.0,                                                   # Seconds before the first retry, doubled each time
+    'budget_per_hour': int(os.getenv('SUMMARY_BUDGET_PER_HOUR', '100'))  # Maximum backend calls per hour
 }
 
 # NLTK settings
+NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', os.path.join(DATA_DIR, 'nltk_data'))  # Provisioned NLTK resources
 NLTK_PACKAGES = [
     'punkt',
     'stopwords',
-    'averaged_perceptron_tagger',
     'punkt_tab'
-] 
\ No newline at end of file
+]
+
+# NLTK resources used at runtime (stopword list and the word_tokenize sentence model)
+NLTK_RESOURCES = [
+    'corpora/stopwords',
+    'tokenizers/punkt'
+]
@@ -0,0 +1,204 @@
+"""Near-duplicate story detection for the News Genie application."""
+
+import hashlib
+import threading
+import zlib
+
+import numpy as np
+
+from config import DEDUPE_SETTINGS
+from utils import logger
+from parsing import INDEXED_FIELDS, text_key, tokenize_fields
+from store import get_store
+
+# Hash values are taken modulo the Mersenne prime 2^31 - 1, so a * x + b fits in 64 bits
+MERSENNE_PRIME = (1 << 31) - 1
+
+# Shared deduplicator instance (created on first use)
+_deduplicator = None
+_deduplicator_lock = threading.Lock()
+
+class MinHasher:
+    """Computes MinHash signatures of token shingle sets.
+
+    Each of the `num_perm` hash functions is a random affine map modulo a
+    prime applied to a CRC32 of the shingle; a fixed seed keeps signatures
+    comparable across processes, so they can be stored.
+    """
+
+    def __init__(self, num_perm, shingle_size, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, tokens):
+        """Return the set of hashed token shingles of a document"""
+        size = min(self.shingle_size, len(tokens))
+        return {
+            zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8')) % MERSENNE_PRIME
+            for i in range(len(tokens) - size + 1)
+        }
+
+    def signature(self, tokens):
+        """Return the MinHash signature of a token list, or None if it has no tokens"""
+        shingles = self.shingles(tokens)
+        if not shingles:
+            return None
+        values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        hashed = (self._a * values + self._b) % MERSENNE_PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+class Deduplicator:
+    """Clusters near-duplicate stories with MinHash signatures and LSH banding.
+
+    Signatures are split into `bands` bands; stories sharing any band land in
+    the same bucket and become candidates, so a new story is compared only
+    with the few stories it collides with instead of the whole store. A
+    candidate joins the story to its cluster when the estimated Jaccard
+    similarity of their shingles reaches the threshold.
+
+    Stories are keyed by (feed_url, story id), and the index is loaded from
+    the signatures saved in the story store on first use.
+    """
+
+    def __init__(self, num_perm, bands, threshold, shingle_size):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # (feed_url, id) -> (signature, cluster_id)
+        self._docs = {}
+        # (band, band values) -> set of (feed_url, id)
+        self._buckets = {}
+        # feed_url -> set of (feed_url, id)
+        self._feed_docs = {}
+
+    def _band_keys(self, signature):
+        """Return the LSH bucket keys of a signature"""
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def _add_locked(self, key, signature, cluster_id):
+        """Index a story's signature; the caller must hold the lock"""
+        self._discard_locked(key)
+        self._docs[key] = (signature, cluster_id)
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+        self._feed_docs.setdefault(key[0], set()).add(key)
+
+    def _discard_locked(self, key):
+        """Remove a story's signature from the buckets; the caller must hold the lock"""
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for band_key in self._band_keys(doc[0]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _remove_feed_locked(self, feed_url):
+        """Drop every story of a feed; the caller must hold the lock"""
+        for key in self._feed_docs.pop(feed_url, ()):
+            self._discard_locked(key)
+
+    def _best_match_locked(self, signature):
+        """Return (cluster_id, similarity) of the most similar indexed story, or None"""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        best = None
+        for key in candidates:
+            other, cluster_id = self._docs[key]
+            similarity = float(np.count_nonzero(other == signature)) / len(signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (cluster_id, similarity)
+        return best
+
+    def load(self, rows):
+        """Index stored stories given as dicts with feed_url, id, cluster_id and minhash"""
+        with self._lock:
+            for row in rows:
+                signature = np.frombuffer(row['minhash'], dtype=np.uint32)
+                self._add_locked((row['feed_url'], row['id']), signature, row['cluster_id'])
+
+    def remove_feed(self, feed_url):
+        """Forget every story of a feed"""
+        with self._lock:
+            self._remove_feed_locked(feed_url)
+
+    def discard(self, feed_url, story_ids):
+        """Forget the given stories of a feed"""
+        with self._lock:
+            feed_docs = self._feed_docs.get(feed_url, set())
+            for story_id in story_ids:
+                key = (feed_url, story_id)
+                self._discard_locked(key)
+                feed_docs.discard(key)
+
+    def assign_clusters(self, feed_url, entries):
+        """Set 'cluster_id' and 'minhash' on a feed's new and changed entries.
+
+        A changed entry replaces the signature of its previous version. An
+        entry joins the cluster of its closest near-duplicate, from any feed
+        or earlier in the same batch, or else starts a new cluster. Returns
+        the number of entries that joined an existing cluster.
+        """
+        signatures = [self.hasher.signature(tokens['title'] + tokens['content'])
+                      for tokens in map(entry_tokens, entries)]
+        duplicates = 0
+        with self._lock:
+            for entry, signature in zip(entries, signatures):
+                key = (feed_url, entry['id'])
+                self._discard_locked(key)
+                if signature is None:
+                    entry['cluster_id'] = new_cluster_id(key)
+                    entry['minhash'] = None
+                    continue
+                match = self._best_match_locked(signature)
+                if match is not None:
+                    entry['cluster_id'] = match[0]
+                    duplicates += 1
+                else:
+                    entry['cluster_id'] = new_cluster_id(key)
+                entry['minhash'] = signature.tobytes()
+                self._add_locked(key, signature, entry['cluster_id'])
+        if duplicates:
+            logger.info(f"Found {duplicates} near-duplicate stories in feed {feed_url}")
+        return duplicates
+
+    def __len__(self):
+        with self._lock:
+            return len(self._docs)
+
+def entry_tokens(entry):
+    """Return an entry's {field: tokens}, tokenizing it unless the parse stage already did"""
+    tokens = entry.get('tokens')
+    if tokens is None:
+        tokens = dict(zip(INDEXED_FIELDS, tokenize_fields(text_key(entry))))
+    return tokens
+
+def new_cluster_id(key):
+    """Derive the ID of a cluster started by the story with the given key"""
+    return hashlib.sha1('\0'.join(key).encode('utf-8')).hexdigest()[:16]
+
+def get_deduplicator():
+    """Return the shared deduplicator, loading stored signatures on first use"""
+    global _deduplicator
+    with _deduplicator_lock:
+        if _deduplicator is None:
+            _deduplicator = Deduplicator(
+                DEDUPE_SETTINGS['num_perm'],
+                DEDUPE_SETTINGS['bands'],
+                DEDUPE_SETTINGS['threshold'],
+                DEDUPE_SETTINGS['shingle_size']
+            )
+            _deduplicator.load(get_store().get_signatures())
+            logger.info(f"Loaded {len(_deduplicator)} story signatures for deduplication")
+        return _deduplicator
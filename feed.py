@@ -1,78 +1,180 @@
 """RSS feed handling module for the News Genie application."""
 
+import re
 import time
-import json
-import os
-import feedparser
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
 
-from config import FEEDS_FILE, DEFAULT_FEEDS, REQUEST_SETTINGS, RATE_LIMIT, PAGINATION
-from utils import logger, check_rate_limit, preprocess_text
+from config import FEEDS_FILE, DEFAULT_FEEDS, REQUEST_SETTINGS, PAGINATION, FETCH_SETTINGS, INGEST_SETTINGS, DEDUPE_SETTINGS, IMPORT_SETTINGS
+from utils import logger
+from ratelimit import rate_limiter
+from cache import response_cache
+from summarizer import summarize_stories, summary_pipeline
+from dedupe import get_deduplicator
+from store import get_store
+from registry import FeedRegistry
+from index import get_index
+from parsing import parse_stage, text_key
+from stream import story_stream
+from metrics import FEED_STAGE_SECONDS, FEED_FETCHES, FEED_ENTRIES, REQUEST_STAGE_SECONDS, host_label
 
-def is_valid_rss(content):
-    """Check if the content is valid RSS/XML"""
+# Cached, lock-protected view of the feeds file
+feed_registry = FeedRegistry(FEEDS_FILE, DEFAULT_FEEDS)
+
+# Shared pool used to fetch feeds in parallel (created on first use)
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+# Shared HTTP session so connections to feed hosts are pooled and reused
+_session = None
+_session_lock = threading.Lock()
+
+# Returned by fetch_feed when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+
+# Returned by fetch_feed when the feed's host is rate limited and the fetch was deferred
+RATE_LIMITED = object()
+
+# Bandwidth counters for feed fetches
+_fetch_stats = {
+    'requests': 0,
+    'full_responses': 0,
+    'not_modified': 0,
+    'bytes_received': 0,
+    'bytes_saved': 0
+}
+_fetch_stats_lock = threading.Lock()
+
+# Outcome counters for the entries of refreshed feeds
+_entry_stats = {
+    'new': 0,
+    'updated': 0,
+    'unchanged': 0,
+    'expired': 0
+}
+
+# Feeds whose last refresh was deferred by the rate limiter
+_rate_limited_feeds = set()
+_rate_limited_lock = threading.Lock()
+
+# Encoding named in a document's XML declaration
+_XML_ENCODING = re.compile(rb'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+# Refreshes currently running, keyed by feed URL, so a feed is never fetched twice at once
+_refreshes_in_flight = {}
+_refreshes_lock = threading.Lock()
+
+def _sniff_root(head):
+    """Return whether the root element of a document head is an RSS or Atom one (False if none opens)"""
+    parser = ET.XMLPullParser(events=('start',))
+    chunk_size = FETCH_SETTINGS['sniff_chunk_size']
     try:
-        root = ET.fromstring(content)
-        if 'rss' in root.tag.lower():
-            return True
-        if 'feed' in root.tag.lower():
-            return True
-        return False
+        for start in range(0, len(head), chunk_size):
+            parser.feed(head[start:start + chunk_size])
+            for _, root in parser.read_events():
+                tag = root.tag.lower()
+                return 'rss' in tag or 'feed' in tag
     except ET.ParseError:
         return False
+    return False
 
-def validate_feed_url(url):
-    """Validate if a URL contains a valid RSS feed"""
+def is_valid_rss(content, encoding=None):
+    """Check if the content starts like an RSS or Atom document.
+
+    Only the first FETCH_SETTINGS['sniff_limit'] bytes are parsed, up to the
+    root element, which usually opens within the first chunk; feedparser
+    parses the whole body afterwards and reports any later malformation.
+    Bodies that expat cannot read as bytes (multi-byte encodings such as
+    gb2312 or shift_jis, encodings it does not know, or a charset given only
+    in the Content-Type header) are decoded with their declared encoding or
+    `encoding`, from the response headers, and checked again.
+    """
+    head = content[:FETCH_SETTINGS['sniff_limit']]
+    try:
+        if _sniff_root(head):
+            return True
+    except (ValueError, LookupError):
+        pass
+    # Multi-byte or unknown encodings, and bodies whose charset is only named in
+    # the Content-Type header, are parsed as decoded text instead
+    declared = _XML_ENCODING.search(head)
+    for candidate in (declared and declared.group(1).decode('ascii'), encoding, 'utf-8'):
+        if not candidate:
+            continue
+        try:
+            text = head.decode(candidate, errors='ignore')
+        except LookupError:
+            continue
+        try:
+            return _sniff_root(text)
+        except (ValueError, LookupError):
+            return False
+    return False
+
+def fetch_and_validate_feed(url, validators=None):
+    """Fetch and parse a feed once, checking that it is a usable feed.
+
+    Returns a tuple of (success, message, parsed), where message is the feed
+    title or the reason the feed was rejected and parsed is a tuple of
+    (processed entries, IDs of every entry in the feed) on success.
+    """
     logger.info(f"Validating feed URL: {url}")
     try:
-        feed_content = fetch_feed(url)
-        if not feed_content:
-            return False, "Could not fetch feed content"
-            
-        feed = feedparser.parse(feed_content)
+        feed_content = fetch_feed(url, validators)
+        if feed_content is RATE_LIMITED:
+            wait_time = rate_limiter.deferred_for(url)
+            return False, f"Feed host is rate limited, try again in {wait_time:.0f} seconds", None
+        if not feed_content or feed_content is NOT_MODIFIED:
+            return False, "Could not fetch feed content", None
+        body, content_type = feed_content
         
-        if feed.bozo:
-            logger.warning(f"Feed parsing error for {url}: {feed.bozo_exception}")
-            return False, "Invalid feed format"
+        # Parsing and tokenizing are CPU-bound and run on the parse stage
+        feed_title, entries, seen_ids, error = parse_stage.parse(url, '', body, content_type=content_type)
+        
+        if error is not None:
+            logger.warning(f"Feed parsing error for {url}: {error}")
+            return False, "Invalid feed format", None
             
-        if not feed.entries:
+        if not seen_ids:
             logger.warning(f"No entries found in feed: {url}")
-            return False, "No entries found in feed"
+            return False, "No entries found in feed", None
             
-        feed_title = feed.feed.get('title', '')
         logger.info(f"Successfully validated feed: {feed_title} ({url})")
-        return True, feed_title
+        return True, feed_title, (entries, seen_ids)
             
     except Exception as e:
         logger.error(f"Error validating feed {url}: {str(e)}", exc_info=True)
-        return False, str(e)
-
-def load_feeds():
-    """Load feeds from feeds file"""
-    if not os.path.exists(FEEDS_FILE):
-        logger.info(f"Feeds file not found. Creating default at {FEEDS_FILE}")
-        with open(FEEDS_FILE, 'w') as f:
-            json.dump(DEFAULT_FEEDS, f)
-        return DEFAULT_FEEDS
-    
+        return False, str(e), None
+
+def validate_feed_url(url):
+    """Validate if a URL contains a valid RSS feed"""
+    is_valid, message, _ = fetch_and_validate_feed(url)
+    return is_valid, message
+
+def load_feeds(strict=False):
+    """Load feeds from the feed registry.
+
+    If the feeds file cannot be read, returns the default feeds, or None
+    with `strict` set so callers can tell a failed read from an empty list.
+    """
     try:
-        with open(FEEDS_FILE, 'r') as f:
-            feeds = json.load(f)
-        logger.info(f"Loaded {len(feeds)} feeds from {FEEDS_FILE}")
-        return feeds
+        return feed_registry.all(strict)
     except Exception as e:
         logger.error(f"Error loading feeds from {FEEDS_FILE}: {str(e)}", exc_info=True)
-        return DEFAULT_FEEDS
+        return None if strict else list(DEFAULT_FEEDS)
+
+def get_feed(url):
+    """Look up a saved feed by URL"""
+    return feed_registry.get(url)
 
 def save_feeds(feeds):
     """Save feeds to feeds file"""
     try:
-        with open(FEEDS_FILE, 'w') as f:
-            json.dump(feeds, f, indent=2)
-        logger.info(f"Saved {len(feeds)} feeds to {FEEDS_FILE}")
+        feed_registry.save(feeds)
         return True
     except Exception as e:
         logger.error(f"Error saving feeds to {FEEDS_FILE}: {str(e)}", exc_info=True)
@@ -80,75 +182,280 @@ def save_feeds(feeds):
 
 def add_feed(url):
     """Add a new feed URL to the feeds list"""
-    # Validate the feed
-    is_valid, title = validate_feed_url(url)
+    # Check if feed already exists before fetching it
+    if get_feed(url) is not None:
+        return False, "Feed already exists"
+    
+    # Validate the feed, keeping what was fetched and parsed to seed the story store
+    validators = {}
+    is_valid, title, parsed = fetch_and_validate_feed(url, validators)
     if not is_valid:
         return False, title  # Return the error message
     
-    # Load existing feeds
-    feeds = load_feeds()
-    
-    # Check if feed already exists
-    for feed in feeds:
-        if feed['url'] == url:
-            return False, "Feed already exists"
-    
-    # Add the new feed
-    feeds.append({
+    new_feed = {
         'url': url,
         'title': title or url,
         'description': '',  # Add empty description field
         'added_date': time.strftime('%Y-%m-%d %H:%M:%S')
-    })
+    }
     
-    # Save feeds
-    if save_feeds(feeds):
-        return True, "Feed added successfully"
-    else:
+    # Add the new feed, re-checking for duplicates under the file lock
+    try:
+        if not feed_registry.add(new_feed):
+            return False, "Feed already exists"
+    except Exception as e:
+        logger.error(f"Error saving feeds to {FEEDS_FILE}: {str(e)}", exc_info=True)
         return False, "Failed to save feed"
+    
+    response_cache.invalidate_feed(url)
+    # Store the validated entries right away instead of fetching the feed again;
+    # its next refresh can then be a conditional request
+    entries, seen_ids = parsed
+    try:
+        store_feed_entries(url, entries, seen_ids, validators)
+    except Exception as e:
+        logger.error(f"Error storing stories of new feed {url}: {str(e)}", exc_info=True)
+        submit_refresh(new_feed)
+    return True, "Feed added successfully"
 
-def remove_feed(url):
-    """Remove a feed URL from the feeds list"""
-    # Load existing feeds
-    feeds = load_feeds()
+def import_feeds(candidates):
+    """Add many feeds at once, validating them in parallel and saving them in a single write.
+
+    `candidates` is a list of {'url', 'title', 'description'} dicts, such
+    as parse_opml returns. URLs already subscribed or listed earlier in
+    `candidates` are skipped without being fetched. The rest are fetched
+    and parsed on a pool of IMPORT_SETTINGS['max_workers'] threads, and
+    the valid ones are added to the feeds file together and their stories
+    stored. Returns one report dict per candidate, in order, with its
+    'url', 'status' ('added', 'exists', 'duplicate', 'invalid' or 'failed')
+    and 'message'.
+    """
+    existing = {feed_data['url'] for feed_data in load_feeds()}
+    reports = []
+    pending = {}
+    for candidate in candidates:
+        url = (candidate.get('url') or '').strip()
+        report = {'url': url, 'status': None, 'message': ''}
+        reports.append(report)
+        if not url:
+            report.update(status='invalid', message="No feed URL provided")
+        elif url in existing:
+            report.update(status='exists', message="Feed already exists")
+        elif url in pending:
+            report.update(status='duplicate', message="Feed listed more than once")
+        else:
+            pending[url] = (candidate, report)
     
-    # Filter out the feed to remove
-    new_feeds = [feed for feed in feeds if feed['url'] != url]
+    def validate(url):
+        validators = {}
+        is_valid, title, parsed = fetch_and_validate_feed(url, validators)
+        return is_valid, title, parsed, validators
     
-    # Check if any feed was removed
-    if len(new_feeds) == len(feeds):
-        return False, "Feed not found"
+    new_feeds = []
+    validated = {}
+    if pending:
+        logger.info(f"Validating {len(pending)} imported feeds")
+        with ThreadPoolExecutor(max_workers=IMPORT_SETTINGS['max_workers'],
+                                thread_name_prefix='feed-import') as executor:
+            results = executor.map(validate, pending)
+            for url, (is_valid, title, parsed, validators) in zip(pending, results):
+                candidate, report = pending[url]
+                if not is_valid:
+                    report.update(status='invalid', message=title)
+                    continue
+                validated[url] = (parsed, validators)
+                new_feeds.append({
+                    'url': url,
+                    'title': title or candidate.get('title') or url,
+                    'description': candidate.get('description') or '',
+                    'added_date': time.strftime('%Y-%m-%d %H:%M:%S')
+                })
     
-    # Save feeds
-    if save_feeds(new_feeds):
-        return True, "Feed removed successfully"
-    else:
+    if not new_feeds:
+        return reports
+    
+    try:
+        added = set(feed_registry.add_many(new_feeds))
+    except Exception as e:
+        logger.error(f"Error saving feeds to {FEEDS_FILE}: {str(e)}", exc_info=True)
+        for new_feed in new_feeds:
+            pending[new_feed['url']][1].update(status='failed', message="Failed to save feed")
+        return reports
+    logger.info(f"Imported {len(added)} feeds")
+    
+    for new_feed in new_feeds:
+        url = new_feed['url']
+        report = pending[url][1]
+        if url not in added:
+            # Added by another request while this import was validating
+            report.update(status='exists', message="Feed already exists")
+            continue
+        report.update(status='added', message="Feed added successfully", title=new_feed['title'])
+        response_cache.invalidate_feed(url)
+        (entries, seen_ids), validators = validated[url]
+        try:
+            store_feed_entries(url, entries, seen_ids, validators)
+        except Exception as e:
+            logger.error(f"Error storing stories of new feed {url}: {str(e)}", exc_info=True)
+            submit_refresh(new_feed)
+    return reports
+
+def remove_feed(url):
+    """Remove a feed URL from the feeds list"""
+    try:
+        if not feed_registry.remove(url):
+            return False, "Feed not found"
+    except Exception as e:
+        logger.error(f"Error saving feeds to {FEEDS_FILE}: {str(e)}", exc_info=True)
         return False, "Failed to remove feed"
+    
+    discard_feed_data(url)
+    return True, "Feed removed successfully"
+
+def discard_feed_data(url):
+    """Drop everything kept for a feed that is no longer subscribed"""
+    get_store().remove_feed(url)
+    _set_rate_limited(url, False)
+    summary_pipeline.forget_feed(url)
+    if DEDUPE_SETTINGS['enabled']:
+        get_deduplicator().remove_feed(url)
+    response_cache.invalidate_feed(url)
+
+def set_feed_description(url, description):
+    """Update the description of a saved feed"""
+    try:
+        if not feed_registry.update(url, description=description):
+            logger.warning(f"Feed not found for URL: '{url}'")
+            return False, "Feed not found"
+    except Exception as e:
+        logger.error(f"Failed to save feeds after updating description for '{url}': {str(e)}", exc_info=True)
+        return False, "Failed to save feed description"
+    
+    logger.info(f"Updated description for feed URL: '{url}'")
+    return True, "Feed description updated successfully"
+
+def get_session():
+    """Return the shared pooled HTTP session used for fetching feeds"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_SETTINGS['max_workers'],
+                pool_maxsize=FETCH_SETTINGS['max_workers']
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session.headers.update({
+                'User-Agent': REQUEST_SETTINGS['user_agent'],
+                'Accept-Encoding': 'gzip, deflate'
+            })
+        return _session
+
+def _record_fetch(**counts):
+    """Add to the feed fetch counters"""
+    with _fetch_stats_lock:
+        for name, value in counts.items():
+            _fetch_stats[name] += value
+
+def _record_entries(**counts):
+    """Add to the per-entry refresh counters"""
+    with _fetch_stats_lock:
+        for name, value in counts.items():
+            _entry_stats[name] += value
 
-def fetch_feed(url):
-    """Fetch feed with retry logic and validation"""
-    logger.info(f"Fetching feed from: {url}")
-    check_rate_limit(url)
+def get_entry_stats():
+    """Return how many refreshed entries were new, updated, unchanged or expired"""
+    with _fetch_stats_lock:
+        return dict(_entry_stats)
+
+def get_fetch_stats():
+    """Return the feed fetch counters, including the 304 hit rate"""
+    with _fetch_stats_lock:
+        stats = dict(_fetch_stats)
+    answered = stats['full_responses'] + stats['not_modified']
+    stats['not_modified_rate'] = stats['not_modified'] / answered if answered else 0.0
+    return stats
+
+def wire_size(response):
+    """Return the size of a response body on the wire, i.e. after gzip/deflate.
+
+    Content-Length gives that size; a missing or malformed header falls back
+    to the size of the decoded body.
+    """
+    try:
+        return int(response.headers['content-length'])
+    except (KeyError, TypeError, ValueError):
+        return len(response.content)
+
+def fetch_feed(url, validators=None):
+    """Fetch feed with retry logic and validation.
+
+    If `validators` is given, its 'etag' and 'last_modified' values are sent as
+    a conditional request. NOT_MODIFIED is returned when the server answers 304;
+    otherwise the dict is updated with the validators of the new response.
+    RATE_LIMITED is returned, without waiting, when the host has no fetch
+    slot available; the fetch should be retried once the limiter allows it.
+    Otherwise returns a tuple of (body bytes, Content-Type header), or None
+    if the feed could not be fetched or is not a feed.
+    """
+    host = host_label(url)
+    wait_time = rate_limiter.try_acquire(url)
+    if wait_time > 0:
+        FEED_FETCHES.inc(host=host, result='rate_limited')
+        logger.debug(f"Rate limiting: deferring fetch of {url} for {wait_time:.1f} seconds")
+        return RATE_LIMITED
+    
+    logger.debug(f"Fetching feed from: {url}")
+    
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
     
     for attempt in range(REQUEST_SETTINGS['max_retries']):
         try:
-            headers = {'User-Agent': REQUEST_SETTINGS['user_agent']}
-            response = requests.get(url, timeout=REQUEST_SETTINGS['timeout'], headers=headers)
+            with FEED_STAGE_SECONDS.time(stage='fetch', host=host):
+                response = get_session().get(url, timeout=REQUEST_SETTINGS['timeout'], headers=headers)
+            
+            if response.status_code == 304:
+                _record_fetch(requests=1, not_modified=1, bytes_saved=(validators or {}).get('body_size') or 0)
+                FEED_FETCHES.inc(host=host, result='not_modified')
+                logger.debug(f"Feed not modified since last fetch: {url}")
+                return NOT_MODIFIED
+            
             response.raise_for_status()
             
+            body_size = wire_size(response)
+            _record_fetch(requests=1, full_responses=1, bytes_received=body_size)
+            
             content_type = response.headers.get('content-type', '').lower()
             if 'xml' not in content_type and 'rss' not in content_type and 'atom' not in content_type:
+                FEED_FETCHES.inc(host=host, result='invalid')
                 logger.warning(f"Invalid content type for {url}: {content_type}")
                 return None
             
-            if not is_valid_rss(response.text):
+            # The raw bytes go to feedparser with the Content-Type header, whose
+            # charset applies when the document does not declare an encoding
+            content = response.content
+            if not is_valid_rss(content, response.encoding):
+                FEED_FETCHES.inc(host=host, result='invalid')
                 logger.warning(f"Invalid RSS content from {url}")
                 return None
+            
+            if validators is not None:
+                validators['etag'] = response.headers.get('etag')
+                validators['last_modified'] = response.headers.get('last-modified')
+                validators['body_size'] = body_size
                 
-            logger.info(f"Successfully fetched feed from {url}")
-            return response.text
+            FEED_FETCHES.inc(host=host, result='ok')
+            logger.debug(f"Successfully fetched feed from {url}")
+            return content, response.headers.get('content-type')
             
         except RequestException as e:
+            FEED_FETCHES.inc(host=host, result='error')
             logger.error(f"Error fetching {url} (attempt {attempt + 1}/{REQUEST_SETTINGS['max_retries']}): {str(e)}")
             if attempt < REQUEST_SETTINGS['max_retries'] - 1:
                 wait_time = 2 ** attempt
@@ -159,99 +466,257 @@ def fetch_feed(url):
     logger.error(f"Failed to fetch feed from {url} after {REQUEST_SETTINGS['max_retries']} attempts")
     return None
 
-def process_entry(entry, feed_url, feed_title):
-    """Process a single feed entry"""
-    try:
-        title = entry.get('title', '')
-        description = entry.get('description', '')
-        
-        content = ""
-        if 'content' in entry:
-            content = entry.content[0].value
-        elif 'summary' in entry:
-            content = entry.summary
-        elif 'description' in entry:
-            content = entry.description
-        
-        if content:
-            soup = BeautifulSoup(content, 'html.parser')
-            content = soup.get_text()
-        
-        # Generate a unique ID for the entry
-        entry_id = entry.get('id', entry.get('guid', entry.get('link', '')))
-        
-        # Get the published date
-        published = entry.get('published', entry.get('pubDate', ''))
+def get_fetch_executor():
+    """Return the shared thread pool used for fetching feeds"""
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(
+                max_workers=FETCH_SETTINGS['max_workers'],
+                thread_name_prefix='feed-fetch'
+            )
+        return _fetch_executor
+
+def load_feed_entries(feed_data, validators=None, known_hashes=frozenset()):
+    """Fetch a single feed, then parse and process its new and changed entries.
+
+    Entries whose hash is in `known_hashes` were processed on an earlier
+    refresh and are skipped. Returns a tuple of (processed entries, IDs of
+    every entry in the feed), NOT_MODIFIED if a conditional fetch with
+    `validators` found no changes, RATE_LIMITED if the fetch was deferred,
+    or None if the feed could not be loaded.
+    """
+    feed_url = feed_data['url']
+    feed_content = fetch_feed(feed_url, validators)
+    if feed_content is NOT_MODIFIED or feed_content is RATE_LIMITED:
+        return feed_content
+    if not feed_content:
+        logger.warning(f"Skipping feed {feed_url} - no content returned")
+        return None
+    body, content_type = feed_content
         
-        return {
-            'id': entry_id,
-            'title': title,
-            'link': entry.get('link', ''),
-            'description': description,
-            'content': content,
-            'published': published,
-            'source': feed_title or feed_url,
-            'feed_url': feed_url
-        }
-    except Exception as e:
-        logger.error(f"Error processing entry from {feed_url}: {str(e)}", exc_info=True)
+    # Parsing and tokenizing are CPU-bound and run on the parse stage
+    feed_title, entries, seen_ids, error = parse_stage.parse(
+        feed_url, feed_data.get('title', ''), body, known_hashes, content_type
+    )
+    
+    if error is not None:
+        logger.error(f"Feed parsing error for {feed_url}: {error}")
         return None
+    
+    logger.debug(f"Processed {len(entries)} new or changed of {len(seen_ids)} entries from feed: {feed_title}")
+    return entries, seen_ids
 
-def get_feed_stories(page=1, items_per_page=None, selected_feeds=None):
-    """Get stories from all feeds with pagination"""
-    if items_per_page is None:
-        items_per_page = PAGINATION['stories_per_page']
+def store_feed_entries(feed_url, entries, seen_ids, validators=None):
+    """Apply a feed's new, changed and vanished entries to the story store, index and deduplicator"""
+    store = get_store()
+    host = host_label(feed_url)
+    if DEDUPE_SETTINGS['enabled']:
+        with FEED_STAGE_SECONDS.time(stage='dedupe', host=host):
+            get_deduplicator().assign_clusters(feed_url, entries)
+    with FEED_STAGE_SECONDS.time(stage='store', host=host):
+        changes = store.update_feed_stories(
+            feed_url, entries, seen_ids, validators,
+            INGEST_SETTINGS['retention'], INGEST_SETTINGS['max_stories_per_feed']
+        )
+    if DEDUPE_SETTINGS['enabled'] and changes['expired_ids']:
+        get_deduplicator().discard(feed_url, changes['expired_ids'])
+    _record_entries(new=changes['new'], updated=changes['updated'],
+                    unchanged=changes['unchanged'], expired=changes['expired'])
+    for change in ('new', 'updated', 'unchanged', 'expired'):
+        if changes[change]:
+            FEED_ENTRIES.inc(changes[change], host=host, change=change)
+    
+    if changes['version'] != changes['old_version']:
+        # Index the changed stories now rather than at query time, reusing the parse stage's tokens
+        index = get_index()
+        with FEED_STAGE_SECONDS.time(stage='index', host=host):
+            if not index.apply_changes(feed_url, changes['old_version'], changes['version'],
+                                       changes['written'], changes['expired_rowids']):
+                index.sync(store, {text_key(entry): entry['tokens'] for entry in entries})
+        response_cache.invalidate_feed(feed_url)
+        # Push the new stories to connected clients
+        story_stream.publish(feed_url, changes['new_rowids'])
+    elif changes['cleared']:
+        # Nothing changed, but the feed is no longer listed as failed
+        response_cache.invalidate_feed(feed_url)
+    summarize_stories(feed_url, entries)
+
+def _set_rate_limited(feed_url, deferred):
+    """Record whether a feed's last refresh was deferred; returns True if that changed"""
+    with _rate_limited_lock:
+        if deferred == (feed_url in _rate_limited_feeds):
+            return False
+        if deferred:
+            _rate_limited_feeds.add(feed_url)
+        else:
+            _rate_limited_feeds.discard(feed_url)
+        return True
+
+def refresh_feed(feed_data):
+    """Fetch a feed and apply its new, changed and vanished entries to the story store.
+
+    Returns True if the feed was refreshed, False if it could not be loaded.
+    """
+    feed_url = feed_data['url']
+    store = get_store()
+    validators = store.get_validators(feed_url)
+    try:
+        loaded = load_feed_entries(feed_data, validators, store.get_entry_hashes(feed_url))
+    except Exception as e:
+        logger.error(f"Error processing feed {feed_url}: {str(e)}", exc_info=True)
+        was_rate_limited = _set_rate_limited(feed_url, False)
+        if store.record_failure(feed_url, str(e)) or was_rate_limited:
+            response_cache.invalidate_feed(feed_url)
+        return False
     
-    logger.info(f"Getting stories (page {page}, {items_per_page} per page)")
-    all_entries = []
-    feeds = load_feeds()
+    # Cached responses list the feeds that failed or are rate limited, so they
+    # are dropped only when one of those changes or stories are stored
+    if loaded is RATE_LIMITED:
+        # Keep serving the stored stories; the feed is retried when its host allows
+        if _set_rate_limited(feed_url, True):
+            response_cache.invalidate_feed(feed_url)
+        return False
+    if _set_rate_limited(feed_url, False):
+        response_cache.invalidate_feed(feed_url)
     
-    if not feeds:
-        logger.warning("No feeds configured. Please add some feeds first.")
-        return [], 0
+    if loaded is NOT_MODIFIED:
+        # Cached responses stay valid unless the feed was listed as failed
+        if store.record_not_modified(feed_url):
+            response_cache.invalidate_feed(feed_url)
+        # Offer the stories skipped by the summarizer again
+        summarize_stories(feed_url)
+        return True
     
+    if loaded is None:
+        if store.record_failure(feed_url, "Could not load feed"):
+            response_cache.invalidate_feed(feed_url)
+        return False
+    
+    entries, seen_ids = loaded
+    store_feed_entries(feed_url, entries, seen_ids, validators)
+    return True
+
+def submit_refresh(feed_data):
+    """Schedule a refresh of a feed on the fetch pool.
+
+    Returns the future of the refresh, reusing the one already running for
+    this feed if there is one.
+    """
+    feed_url = feed_data['url']
+    with _refreshes_lock:
+        future = _refreshes_in_flight.get(feed_url)
+        if future is not None:
+            return future
+        future = get_fetch_executor().submit(refresh_feed, feed_data)
+        _refreshes_in_flight[feed_url] = future
+    
+    def _done(_):
+        with _refreshes_lock:
+            if _refreshes_in_flight.get(feed_url) is future:
+                del _refreshes_in_flight[feed_url]
+    future.add_done_callback(_done)
+    return future
+
+def is_refresh_in_flight(feed_url):
+    """Check whether a refresh of the feed is currently running"""
+    with _refreshes_lock:
+        return feed_url in _refreshes_in_flight
+
+def is_feed_due(feed_data, feed_state, now=None):
+    """Check whether a feed's refresh interval has elapsed since its last attempt"""
+    if rate_limiter.is_deferred(feed_data['url']):
+        return False
+    if not feed_state or not feed_state.get('last_attempt'):
+        return True
+    if now is None:
+        now = time.time()
+    interval = feed_data.get('refresh_interval', INGEST_SETTINGS['refresh_interval'])
+    return now - feed_state['last_attempt'] >= interval
+
+def refresh_feeds(feeds, deadline=None):
+    """Refresh several feeds concurrently, waiting at most `deadline` seconds.
+
+    Feeds still running when the deadline passes keep going in the background
+    and write to the store when they finish.
+    """
+    if deadline is None:
+        deadline = FETCH_SETTINGS['deadline']
+    
+    futures = [submit_refresh(feed_data) for feed_data in feeds]
+    if futures:
+        wait(futures, timeout=deadline)
+
+def refresh_due_feeds(feeds):
+    """Refresh due feeds on request when background ingestion is disabled.
+
+    Returns the current refresh state of the given feeds.
+    """
+    store = get_store()
+    feed_urls = [feed_data['url'] for feed_data in feeds]
+    feed_states = store.get_feed_states(feed_urls)
+    
+    if not INGEST_SETTINGS['enabled']:
+        now = time.time()
+        due_feeds = [feed_data for feed_data in feeds
+                     if is_feed_due(feed_data, feed_states.get(feed_data['url']), now)]
+        if due_feeds:
+            refresh_feeds(due_feeds)
+            feed_states = store.get_feed_states(feed_urls)
+    
+    return feed_states
+
+def get_feed_status(feeds, feed_states):
+    """List the feeds whose last refresh failed, those with no stories yet and those rate limited"""
+    failed = []
+    late = []
+    rate_limited = []
     for feed_data in feeds:
-        feed_url = feed_data['url']
-        
-        # Skip this feed if it's not in the selected feeds
-        if selected_feeds and feed_url not in selected_feeds:
-            logger.info(f"Skipping feed {feed_url} - not in selected feeds")
-            continue
-            
-        try:
-            # Set a timeout for feed processing to prevent hanging
-            feed_content = fetch_feed(feed_url)
-            if not feed_content:
-                logger.warning(f"Skipping feed {feed_url} - no content returned")
-                continue
-                
-            feed = feedparser.parse(feed_content)
-            
-            if feed.bozo:
-                logger.error(f"Feed parsing error for {feed_url}: {feed.bozo_exception}")
-                continue
-            
-            feed_title = feed.feed.get('title', feed_data.get('title', ''))
-            logger.info(f"Processing {len(feed.entries)} entries from feed: {feed_title}")
-            
-            for entry in feed.entries:
-                processed_entry = process_entry(entry, feed_url, feed_title)
-                if processed_entry:
-                    all_entries.append(processed_entry)
-                    
-        except Exception as e:
-            logger.error(f"Error processing feed {feed_url}: {str(e)}", exc_info=True)
-            continue
+        state = feed_states.get(feed_data['url'])
+        if rate_limiter.is_deferred(feed_data['url']):
+            rate_limited.append(feed_data['url'])
+        if state and state.get('last_error'):
+            failed.append(feed_data['url'])
+        elif not state or not state.get('last_success'):
+            late.append(feed_data['url'])
+    return {'failed': sorted(failed), 'late': sorted(late), 'rate_limited': sorted(rate_limited)}
+
+def get_feed_stories(page=1, items_per_page=None, selected_feeds=None, before=None, collapse=False):
+    """Get stories from the story store with pagination.
+
+    Pages are addressed either by number or, with `before` set to a
+    (published_ts, id, feed_url) cursor, as the stories following that one. With
+    `collapse` set, only one story of each near-duplicate cluster is listed.
+
+    When background ingestion is disabled, feeds whose refresh interval has
+    elapsed are refreshed first (bounded by the fetch deadline).
+
+    Returns a tuple of (stories for the page, total story count, feed status),
+    where feed status lists the feeds that failed or have no stories yet.
+    """
+    if items_per_page is None:
+        items_per_page = PAGINATION['stories_per_page']
+    
+    logger.debug(f"Getting stories (page {page}, {items_per_page} per page)")
+    if selected_feeds:
+        # Look up only the selected feeds rather than scanning every subscription
+        feeds = [feed_data for feed_data in map(get_feed, dict.fromkeys(selected_feeds))
+                 if feed_data is not None]
+    else:
+        feeds = load_feeds()
     
-    # Sort entries by published date (newest first)
-    all_entries.sort(key=lambda x: x.get('published', ''), reverse=True)
+    if not feeds:
+        logger.warning("No matching feeds configured. Please add some feeds first.")
+        return [], 0, {'failed': [], 'late': [], 'rate_limited': []}
     
-    # Calculate pagination
-    total_entries = len(all_entries)
-    start_idx = (page - 1) * items_per_page
-    end_idx = start_idx + items_per_page
+    store = get_store()
+    with REQUEST_STAGE_SECONDS.time(operation='stories', stage='refresh'):
+        feed_states = refresh_due_feeds(feeds)
     
-    paginated_entries = all_entries[start_idx:end_idx] if start_idx < total_entries else []
+    with REQUEST_STAGE_SECONDS.time(operation='stories', stage='query'):
+        paginated_entries, total_entries = store.get_stories(
+            page, items_per_page, [feed_data['url'] for feed_data in feeds], before, collapse
+        )
     
-    logger.info(f"Returning {len(paginated_entries)} entries (page {page} of {max(1, (total_entries + items_per_page - 1) // items_per_page)})")
-    return paginated_entries, total_entries 
\ No newline at end of file
+    logger.debug(f"Returning {len(paginated_entries)} entries (page {page} of {max(1, (total_entries + items_per_page - 1) // items_per_page)})")
+    return paginated_entries, total_entries, get_feed_status(feeds, feed_states)
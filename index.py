@@ -0,0 +1,217 @@
+"""Inverted search index for the News Genie application."""
+
+import sys
+import threading
+
+from utils import logger
+from store import get_store
+from parsing import INDEXED_FIELDS, parse_stage, text_key, tokenize_fields
+
+# Position of each indexed field in IndexedDocument.lengths
+FIELD_POSITIONS = {field: position for position, field in enumerate(INDEXED_FIELDS)}
+
+# Shared index instance (created on first use)
+_index = None
+_index_lock = threading.Lock()
+
+class IndexedDocument:
+    """Metadata the index keeps for one document.
+
+    Slots and tuples instead of dicts and sets keep the per-document cost
+    low; the feed URL is interned so the documents of a feed share it.
+    """
+
+    __slots__ = ('feed_url', 'published_ts', 'cluster_id', 'lengths', 'terms')
+
+    def __init__(self, feed_url, published_ts, cluster_id, lengths, terms):
+        self.feed_url = sys.intern(feed_url)
+        self.published_ts = published_ts
+        self.cluster_id = cluster_id
+        # Token count of each of INDEXED_FIELDS, in order
+        self.lengths = lengths
+        self.terms = terms
+
+    def length(self, field):
+        """Return the token count of an indexed field"""
+        return self.lengths[FIELD_POSITIONS[field]]
+
+class InvertedIndex:
+    """In-memory inverted index mapping terms to per-field postings.
+
+    Each posting records, for one document and one field, the positions at
+    which the term occurs; the term frequency is the number of positions.
+    Documents are keyed by their story store row ID.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        # term -> {doc_id: {field: positions}}
+        self._postings = {}
+        # doc_id -> IndexedDocument
+        self._docs = {}
+        # feed_url -> set of doc_ids
+        self._feed_docs = {}
+        # feed_url -> store version the feed was indexed at
+        self._feed_versions = {}
+        # field -> total token count over all documents, for average field lengths
+        self._field_totals = {field: 0 for field in INDEXED_FIELDS}
+
+    def add_document(self, doc_id, story):
+        """Tokenize a story's fields and add it to the index"""
+        field_tokens = dict(zip(INDEXED_FIELDS, tokenize_fields(text_key(story))))
+        self.add_tokens(doc_id, story, field_tokens)
+
+    def add_tokens(self, doc_id, story, field_tokens):
+        """Add a story whose fields are already tokenized to the index"""
+        field_positions = {}
+        lengths = []
+        for field in INDEXED_FIELDS:
+            tokens = field_tokens.get(field, ())
+            lengths.append(len(tokens))
+            for position, token in enumerate(tokens):
+                field_positions.setdefault(token, {}).setdefault(field, []).append(position)
+
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove_document_locked(doc_id)
+            for term, fields in field_positions.items():
+                self._postings.setdefault(term, {})[doc_id] = {
+                    field: tuple(positions) for field, positions in fields.items()
+                }
+            doc = IndexedDocument(
+                story.get('feed_url'),
+                story.get('published_ts') or 0.0,
+                story.get('cluster_id'),
+                tuple(lengths),
+                tuple(field_positions)
+            )
+            self._docs[doc_id] = doc
+            self._feed_docs.setdefault(doc.feed_url, set()).add(doc_id)
+            for field, length in zip(INDEXED_FIELDS, lengths):
+                self._field_totals[field] += length
+
+    def remove_document(self, doc_id):
+        """Remove a document and all its postings from the index"""
+        with self._lock:
+            self._remove_document_locked(doc_id)
+
+    def _remove_document_locked(self, doc_id):
+        """Remove a document; the caller must hold the index lock"""
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for field, length in zip(INDEXED_FIELDS, doc.lengths):
+            self._field_totals[field] -= length
+        for term in doc.terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        feed_docs = self._feed_docs.get(doc.feed_url)
+        if feed_docs is not None:
+            feed_docs.discard(doc_id)
+            if not feed_docs:
+                del self._feed_docs[doc.feed_url]
+
+    def remove_feed(self, feed_url):
+        """Remove every document of a feed from the index"""
+        with self._lock:
+            for doc_id in list(self._feed_docs.get(feed_url, ())):
+                self._remove_document_locked(doc_id)
+            self._feed_versions.pop(feed_url, None)
+
+    def index_feed(self, feed_url, stories, version, tokenized=None):
+        """Replace a feed's documents with the given stored stories.
+
+        `tokenized` maps the text_key of stories to tokens computed earlier;
+        the other stories are tokenized on the parse stage.
+        """
+        tokenized = tokenized or {}
+        field_tokens = [tokenized.get(text_key(story)) for story in stories]
+        missing = [i for i, tokens in enumerate(field_tokens) if tokens is None]
+        for i, tokens in zip(missing, parse_stage.tokenize([stories[i] for i in missing])):
+            field_tokens[i] = tokens
+
+        self.remove_feed(feed_url)
+        for story, tokens in zip(stories, field_tokens):
+            self.add_tokens(story.rowid, story, tokens)
+        with self._lock:
+            self._feed_versions[feed_url] = version
+
+    def apply_changes(self, feed_url, old_version, version, written, removed_rowids):
+        """Apply one refresh's changes to a feed's documents without re-indexing the whole feed.
+
+        `written` holds (row ID, entry) pairs of new and updated stories,
+        whose entries may carry their tokens under 'tokens'. The changes
+        apply only if the feed was indexed at `old_version`; returns False
+        otherwise, in which case sync must bring the feed up to date.
+        """
+        with self._sync_lock:
+            with self._lock:
+                if self._feed_versions.get(feed_url) != old_version:
+                    return False
+            missing = [entry for _, entry in written if entry.get('tokens') is None]
+            tokenized = dict(zip(map(text_key, missing), parse_stage.tokenize(missing)))
+            for rowid in removed_rowids:
+                self.remove_document(rowid)
+            for rowid, entry in written:
+                tokens = entry.get('tokens')
+                self.add_tokens(rowid, entry, tokens if tokens is not None else tokenized[text_key(entry)])
+            with self._lock:
+                self._feed_versions[feed_url] = version
+        return True
+
+    def sync(self, store=None, tokenized=None):
+        """Bring the index up to date with the story store.
+
+        Only feeds whose story version changed since they were indexed are
+        re-tokenized, so this is cheap when nothing was ingested. Tokens
+        already computed for some stories can be passed in `tokenized`,
+        keyed by text_key.
+        """
+        store = store or get_store()
+        with self._sync_lock:
+            versions = store.get_feed_versions()
+            with self._lock:
+                indexed = dict(self._feed_versions)
+
+            for feed_url in indexed:
+                if feed_url not in versions:
+                    self.remove_feed(feed_url)
+
+            for feed_url, version in versions.items():
+                if indexed.get(feed_url) != version:
+                    stories = store.get_feed_documents(feed_url)
+                    self.index_feed(feed_url, stories, version, tokenized)
+                    logger.info(f"Indexed {len(stories)} stories for feed {feed_url}")
+
+    def postings(self, term):
+        """Return the postings of a term as {doc_id: {field: positions}}"""
+        with self._lock:
+            return dict(self._postings.get(term, {}))
+
+    def get_document(self, doc_id):
+        """Return the indexed metadata of a document"""
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def average_field_lengths(self):
+        """Return the mean token count of each indexed field over all documents"""
+        with self._lock:
+            count = len(self._docs)
+            return {field: (total / count if count else 0.0) for field, total in self._field_totals.items()}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._docs)
+
+def get_index():
+    """Return the shared search index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = InvertedIndex()
+        return _index
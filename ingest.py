@@ -0,0 +1,108 @@
+"""Background feed ingestion for the News Genie application."""
+
+import multiprocessing
+import threading
+import time
+
+from config import INGEST_SETTINGS
+from utils import logger
+from feed import load_feeds, submit_refresh, is_feed_due, is_refresh_in_flight, get_fetch_stats, get_entry_stats, discard_feed_data
+from store import get_store
+from ratelimit import rate_limiter
+from summarizer import summary_pipeline
+from parsing import parse_stage
+from stream import story_stream
+
+class IngestScheduler:
+    """Background thread that refreshes each feed when its interval elapses"""
+
+    def __init__(self, tick=None):
+        self.tick = tick or INGEST_SETTINGS['tick']
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.last_run = None
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ingest-scheduler', daemon=True)
+        self._thread.start()
+        self.started_at = time.time()
+        logger.info(f"Ingest scheduler started (tick {self.tick}s)")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick)
+        logger.info("Ingest scheduler stopped")
+
+    def is_running(self):
+        """Check whether the scheduler thread is alive"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        """Scheduler loop"""
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in ingest scheduler: {str(e)}", exc_info=True)
+            self._stop_event.wait(self.tick)
+
+    def run_once(self):
+        """Drop stories of removed feeds and submit refreshes for every due feed"""
+        # The feed list is re-read every tick so added and removed feeds are picked up
+        feeds = load_feeds(strict=True)
+        if feeds is None:
+            # Never drop stories on the strength of a failed read; try again next tick
+            logger.warning("Could not read the feed list; skipping this ingest tick")
+            return
+        feed_states = get_store().get_feed_states()
+
+        current_urls = {feed_data['url'] for feed_data in feeds}
+        for feed_url in feed_states:
+            if feed_url not in current_urls:
+                discard_feed_data(feed_url)
+
+        now = time.time()
+        due = 0
+        for feed_data in feeds:
+            if is_refresh_in_flight(feed_data['url']):
+                continue
+            if is_feed_due(feed_data, feed_states.get(feed_data['url']), now):
+                submit_refresh(feed_data)
+                due += 1
+
+        if due:
+            logger.info(f"Ingest scheduler submitted {due} feed refreshes")
+        self.last_run = now
+
+    def status(self):
+        """Return a summary of the scheduler and per-feed refresh state"""
+        return {
+            'running': self.is_running(),
+            'started_at': self.started_at,
+            'last_run': self.last_run,
+            'fetch': get_fetch_stats(),
+            'entries': get_entry_stats(),
+            'rate_limits': rate_limiter.status(),
+            'parse': parse_stage.status(),
+            'summaries': summary_pipeline.status(),
+            'stream': story_stream.status(),
+            'feeds': get_store().get_feed_states()
+        }
+
+# Shared scheduler instance
+scheduler = IngestScheduler()
+
+def start_scheduler():
+    """Start background ingestion if it is enabled"""
+    # Spawned parse workers re-import the main module; only the main process ingests
+    if multiprocessing.parent_process() is not None:
+        return
+    if INGEST_SETTINGS['enabled']:
+        scheduler.start()
@@ -0,0 +1,273 @@
+"""Runtime metrics and request profiling for the News Genie application."""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from config import METRICS_SETTINGS
+from utils import logger
+
+# Upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def host_label(url):
+    """Return the host of a feed URL, used to label per-feed metrics"""
+    return urlparse(url).hostname or 'unknown'
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base of the metric types: a named family of values keyed by label values"""
+
+    kind = None
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        """Return the label values of a sample in label_names order"""
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.label_names)
+
+    def render(self):
+        """Return the lines of this metric in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = [(key, self._snapshot(value)) for key, value in self._values.items()]
+        for key, value in sorted(values):
+            lines.extend(self._sample_lines(list(zip(self.label_names, key)), value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _sample_lines(self, pairs, value):
+        return [f"{self.name}{_format_labels(pairs)} {_format_value(value)}"]
+
+class Histogram(Metric):
+    """Distribution of observed values, usually durations in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one past every bound), sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _snapshot(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _sample_lines(self, pairs, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Set of metrics rendered together for the /metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, label_names=()):
+        return self._register(Counter(name, help, label_names))
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Shared registry and the application's metrics
+registry = MetricsRegistry()
+
+FEED_STAGE_SECONDS = registry.histogram(
+    'newsgenie_feed_stage_seconds',
+    'Seconds spent on one feed in an ingestion stage (fetch, parse, html_strip, tokenize, dedupe, store, index)',
+    ('stage', 'host')
+)
+FEED_FETCHES = registry.counter(
+    'newsgenie_feed_fetches_total',
+    'Feed fetch attempts by result (ok, not_modified, invalid, error, rate_limited)',
+    ('host', 'result')
+)
+FEED_ENTRIES = registry.counter(
+    'newsgenie_feed_entries_total',
+    'Feed entries applied to the story store by change (new, updated, unchanged, expired)',
+    ('host', 'change')
+)
+REQUEST_STAGE_SECONDS = registry.histogram(
+    'newsgenie_request_stage_seconds',
+    'Seconds a story listing or search spent in a stage (refresh, query, tokenize, score, sort, load, serialize)',
+    ('operation', 'stage')
+)
+HTTP_REQUESTS = registry.counter(
+    'newsgenie_http_requests_total',
+    'HTTP requests served, by endpoint, method and status code',
+    ('endpoint', 'method', 'status')
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'newsgenie_http_request_seconds',
+    'Seconds taken to build the response of an HTTP request',
+    ('endpoint',)
+)
+
+def _collapse_stack(frame, max_depth=64):
+    """Return a stack as 'outermost;...;innermost' frames of module:function"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class RequestProfiler:
+    """Sampling profiler for the threads serving requests.
+
+    A single daemon thread wakes every `interval` seconds while requests are
+    being profiled and counts the current stack of each thread registered
+    with start(). When stop() finds that the request took at least
+    `slow_seconds`, its collapsed stacks (the format flame graph tools
+    read) are logged and kept among the `kept` most recent slow profiles;
+    the samples of faster requests are dropped.
+    """
+
+    def __init__(self, interval, slow_seconds, kept, top_stacks=20):
+        self.interval = interval
+        self.slow_seconds = slow_seconds
+        self.top_stacks = top_stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._active = {}
+        self._thread = None
+        self._profiles = deque(maxlen=kept)
+
+    def start(self):
+        """Start sampling the calling thread"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = {}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def stop(self, description, seconds):
+        """Stop sampling the calling thread, keeping its profile if the request was slow"""
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if stacks is None or seconds < self.slow_seconds:
+            return None
+        top = sorted(stacks.items(), key=lambda item: item[1], reverse=True)[:self.top_stacks]
+        profile = {
+            'request': description,
+            'seconds': round(seconds, 4),
+            'samples': sum(stacks.values()),
+            'finished_at': time.time(),
+            'stacks': [{'stack': stack, 'samples': samples} for stack, samples in top]
+        }
+        with self._lock:
+            self._profiles.append(profile)
+        hottest = top[0][0].rsplit(';', 3)[-3:] if top else []
+        logger.warning(f"Slow request {description} took {seconds:.3f}s "
+                       f"({profile['samples']} samples, hottest: {';'.join(hottest)})")
+        return profile
+
+    def profiles(self):
+        """Return the most recent slow-request profiles, newest first"""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = _collapse_stack(frame)
+                        stacks[stack] = stacks.get(stack, 0) + 1
+            del frames
+
+# Shared profiler, or None unless profiling is turned on
+request_profiler = RequestProfiler(
+    METRICS_SETTINGS['profile_interval'],
+    METRICS_SETTINGS['slow_request_seconds'],
+    METRICS_SETTINGS['profiles_kept']
+) if METRICS_SETTINGS['profiler'] else None
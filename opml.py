@@ -0,0 +1,47 @@
+"""OPML import and export of feed lists for the News Genie application."""
+
+import time
+import xml.etree.ElementTree as ET
+
+def parse_opml(content):
+    """Parse an OPML document into candidate feeds.
+
+    Returns a list of {'url', 'title', 'description'} dicts, one for each
+    outline with an xmlUrl attribute at any depth (outlines used as folders
+    are flattened), in document order. Raises ValueError if the document is
+    not OPML.
+    """
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid OPML document: {e}")
+    if root.tag.lower() != 'opml' or root.find('body') is None:
+        raise ValueError("Invalid OPML document: missing opml body")
+
+    feeds = []
+    for outline in root.find('body').iter('outline'):
+        url = (outline.get('xmlUrl') or '').strip()
+        if not url:
+            continue
+        feeds.append({
+            'url': url,
+            'title': (outline.get('title') or outline.get('text') or '').strip(),
+            'description': (outline.get('description') or '').strip()
+        })
+    return feeds
+
+def build_opml(feeds, title='News Genie feeds'):
+    """Serialize feeds as an OPML 2.0 document, returned as UTF-8 bytes"""
+    root = ET.Element('opml', version='2.0')
+    head = ET.SubElement(root, 'head')
+    ET.SubElement(head, 'title').text = title
+    ET.SubElement(head, 'dateCreated').text = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime())
+    body = ET.SubElement(root, 'body')
+    for feed in feeds:
+        feed_title = feed.get('title') or feed['url']
+        attributes = {'type': 'rss', 'text': feed_title, 'title': feed_title, 'xmlUrl': feed['url']}
+        if feed.get('description'):
+            attributes['description'] = feed['description']
+        ET.SubElement(body, 'outline', attributes)
+    ET.indent(root)
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
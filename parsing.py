@@ -0,0 +1,268 @@
+"""Feed parsing and tokenization stage for the News Genie application."""
+
+import calendar
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import feedparser
+
+from config import PARSE_SETTINGS
+from metrics import FEED_STAGE_SECONDS, host_label
+from utils import logger, parse_timestamp, html_to_text, preprocess_text
+
+# Fields of a processed entry, in the order they are packed into rows
+ENTRY_FIELDS = ('id', 'title', 'link', 'description', 'content', 'published', 'published_ts', 'source', 'feed_url',
+                'entry_hash')
+
+# Raw entry values process_entry reads; an entry whose values are unchanged is not processed again
+HASHED_KEYS = ('id', 'link', 'title', 'description', 'summary', 'published', 'published_parsed', 'updated_parsed')
+
+# Story fields that are tokenized for search and deduplication
+INDEXED_FIELDS = ('title', 'description', 'content')
+
+# Indexed fields that process_entry already reduced to plain text
+PLAIN_TEXT_FIELDS = ('content',)
+
+# Ways the stage can run its work
+PARSE_MODES = ('inline', 'thread', 'process')
+
+def entry_id(entry):
+    """Return the unique ID of a raw feed entry"""
+    return entry.get('id', entry.get('guid', entry.get('link', '')))
+
+def entry_hash(entry, feed_title):
+    """Hash a raw feed entry, together with the feed title its source is taken from"""
+    parts = [feed_title or '']
+    parts += [repr(entry.get(key)) for key in HASHED_KEYS]
+    if 'content' in entry:
+        parts.append(entry.content[0].value)
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+def process_entry(entry, feed_url, feed_title, timings=None):
+    """Process a single feed entry.
+
+    If `timings` is given, the seconds spent reducing HTML to text are added
+    to its 'html_strip' value.
+    """
+    try:
+        title = entry.get('title', '')
+        description = entry.get('description', '')
+
+        content = ""
+        if 'content' in entry:
+            content = entry.content[0].value
+        elif 'summary' in entry:
+            content = entry.summary
+        elif 'description' in entry:
+            content = entry.description
+
+        if content:
+            # Reduced to plain text once here; search and deduplication tokenize it as is
+            start = time.perf_counter()
+            content = html_to_text(content)
+            if timings is not None:
+                timings['html_strip'] += time.perf_counter() - start
+
+        # Get the published date, normalized to a timestamp for sorting
+        published = entry.get('published', entry.get('pubDate', ''))
+        published_parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+        if published_parsed:
+            published_ts = float(calendar.timegm(published_parsed))
+        else:
+            published_ts = parse_timestamp(published)
+
+        return {
+            'id': entry_id(entry),
+            'title': title,
+            'link': entry.get('link', ''),
+            'description': description,
+            'content': content,
+            'published': published,
+            'published_ts': published_ts,
+            'source': feed_title or feed_url,
+            'feed_url': feed_url
+        }
+    except Exception as e:
+        logger.error(f"Error processing entry from {feed_url}: {str(e)}", exc_info=True)
+        return None
+
+def tokenize_fields(texts):
+    """Tokenize the INDEXED_FIELDS values of a story, returning one token tuple per field"""
+    return tuple(
+        tuple(preprocess_text(text, html=field not in PLAIN_TEXT_FIELDS))
+        for field, text in zip(INDEXED_FIELDS, texts)
+    )
+
+def text_key(story):
+    """Return the indexed field values of a story, which determine its tokens"""
+    return tuple(story.get(field) or '' for field in INDEXED_FIELDS)
+
+def parse_feed_content(feed_url, feed_title, content, known_hashes=frozenset(), content_type=None):
+    """Parse a feed body and process and tokenize its new and changed entries.
+
+    Entries whose entry_hash is in `known_hashes` were processed on an
+    earlier refresh and are only listed as seen. Runs in a parse worker, so
+    it returns plain values that are cheap to pickle: (feed title, rows,
+    seen IDs, error, timings). Each row holds the ENTRY_FIELDS values
+    followed by the token tuples of INDEXED_FIELDS; seen IDs lists the ID of
+    every entry in the feed, each once; timings holds the seconds spent in
+    the 'parse', 'html_strip' and 'tokenize' stages. If the body is not a
+    valid feed, rows is None and error describes the problem. `content_type`
+    is the response's Content-Type header, whose charset feedparser applies
+    to bodies that do not declare their encoding.
+    """
+    timings = {'parse': 0.0, 'html_strip': 0.0, 'tokenize': 0.0}
+    start = time.perf_counter()
+    feed = feedparser.parse(content, response_headers={'content-type': content_type} if content_type else None)
+    timings['parse'] = time.perf_counter() - start
+    if feed.bozo:
+        return feed_title, None, None, str(feed.bozo_exception), timings
+
+    feed_title = feed.feed.get('title', feed_title)
+    rows = []
+    seen = {}
+    for entry in feed.entries:
+        # Later copies of an entry listed twice are ignored
+        story_id = entry_id(entry)
+        if story_id in seen:
+            continue
+        seen[story_id] = None
+        digest = entry_hash(entry, feed_title)
+        if digest in known_hashes:
+            continue
+        processed_entry = process_entry(entry, feed_url, feed_title, timings)
+        if processed_entry:
+            processed_entry['entry_hash'] = digest
+            values = tuple(processed_entry[field] for field in ENTRY_FIELDS)
+            start = time.perf_counter()
+            tokens = tokenize_fields(text_key(processed_entry))
+            timings['tokenize'] += time.perf_counter() - start
+            rows.append(values + tokens)
+    return feed_title, rows, tuple(seen), None, timings
+
+def unpack_entries(rows):
+    """Rebuild processed entry dicts from parsed rows, with their tokens under 'tokens'"""
+    width = len(ENTRY_FIELDS)
+    entries = []
+    for row in rows:
+        entry = dict(zip(ENTRY_FIELDS, row))
+        entry['tokens'] = dict(zip(INDEXED_FIELDS, row[width:]))
+        entries.append(entry)
+    return entries
+
+class ParseStage:
+    """Runs the CPU-bound parse and tokenize work of feed ingestion.
+
+    In 'inline' mode the work runs in the calling thread; in 'thread' mode on
+    a thread pool; in 'process' mode on a pool of worker processes, which
+    sidesteps the GIL so feeds refreshed concurrently are parsed on every
+    core. Workers exchange only strings and tuples with the caller, and
+    stored stories are tokenized in chunks of `chunk_size` per task to keep
+    the number of round trips low. If a worker process dies, the pool is
+    replaced and the affected call runs inline.
+    """
+
+    def __init__(self, mode, workers, chunk_size, start_method='spawn'):
+        if mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {'feeds': 0, 'entries': 0, 'skipped': 0, 'tokenized': 0, 'fallbacks': 0}
+
+    def _get_executor(self):
+        """Return the worker pool, creating it on first use"""
+        with self._lock:
+            if self._executor is None:
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method)
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='feed-parse')
+                logger.info(f"Started {self.workers} {self.mode} parse workers")
+            return self._executor
+
+    def _reset_executor(self, executor):
+        """Drop a broken worker pool so the next call starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            self._stats['fallbacks'] += 1
+        executor.shutdown(wait=False)
+
+    def _record(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def parse(self, feed_url, feed_title, content, known_hashes=frozenset(), content_type=None):
+        """Parse a feed body into its new and changed processed entries.
+
+        Returns (feed title, entries, seen IDs, error) as parse_feed_content
+        does, with the entries unpacked into dicts. The time spent in each
+        stage is recorded in the feed stage metrics.
+        """
+        args = (feed_url, feed_title, content, frozenset(known_hashes), content_type)
+        if self.mode == 'inline':
+            feed_title, rows, seen, error, timings = parse_feed_content(*args)
+        else:
+            executor = self._get_executor()
+            try:
+                feed_title, rows, seen, error, timings = executor.submit(parse_feed_content, *args).result()
+            except BrokenProcessPool:
+                logger.error(f"Parse worker died while parsing {feed_url}; parsing it inline")
+                self._reset_executor(executor)
+                feed_title, rows, seen, error, timings = parse_feed_content(*args)
+        host = host_label(feed_url)
+        for stage, seconds in timings.items():
+            FEED_STAGE_SECONDS.observe(seconds, stage=stage, host=host)
+        if rows is None:
+            return feed_title, None, None, error
+        self._record(feeds=1, entries=len(rows), skipped=len(seen) - len(rows))
+        return feed_title, unpack_entries(rows), seen, None
+
+    def tokenize(self, stories):
+        """Tokenize stories, returning a {field: tokens} dict for each"""
+        texts = [text_key(story) for story in stories]
+        if self.mode == 'inline' or len(texts) <= self.chunk_size:
+            results = list(map(tokenize_fields, texts))
+        else:
+            executor = self._get_executor()
+            try:
+                results = list(executor.map(tokenize_fields, texts, chunksize=self.chunk_size))
+            except BrokenProcessPool:
+                logger.error("Parse worker died while tokenizing stories; tokenizing them inline")
+                self._reset_executor(executor)
+                results = list(map(tokenize_fields, texts))
+        self._record(tokenized=len(results))
+        return [dict(zip(INDEXED_FIELDS, tokens)) for tokens in results]
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def status(self):
+        """Return the stage configuration and work counters"""
+        with self._lock:
+            return dict(self._stats, mode=self.mode, workers=self.workers,
+                        running=self._executor is not None)
+
+# Shared parse stage instance
+parse_stage = ParseStage(
+    PARSE_SETTINGS['mode'],
+    PARSE_SETTINGS['workers'],
+    PARSE_SETTINGS['chunk_size'],
+    PARSE_SETTINGS['start_method']
+)
@@ -0,0 +1,18 @@
+"""One-time provisioning of NLTK data for the News Genie application.
+
+Run this once per host (or at image build time) before starting the app:
+    python provision.py
+"""
+
+import sys
+
+from config import NLTK_DATA_DIR
+from utils import logger, provision_nltk, find_missing_nltk_resources
+
+if __name__ == '__main__':
+    provision_nltk(NLTK_DATA_DIR)
+    missing = find_missing_nltk_resources()
+    if missing:
+        logger.error(f"NLTK resources still missing after provisioning: {', '.join(missing)}")
+        sys.exit(1)
+    logger.info(f"NLTK data provisioned in {NLTK_DATA_DIR}")
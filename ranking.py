@@ -0,0 +1,161 @@
+"""Ranking engines for the News Genie search."""
+
+import math
+
+import numpy as np
+
+from index import INDEXED_FIELDS
+from config import SEARCH_SETTINGS
+
+FIELD_WEIGHTS = {
+    'title': SEARCH_SETTINGS['title_weight'],
+    'description': SEARCH_SETTINGS['description_weight'],
+    'content': SEARCH_SETTINGS['content_weight']
+}
+
+def score_positions(term_positions, length, keyword_tokens):
+    """Calculate relevance score from the positions of keyword terms in a token list.
+
+    `term_positions` maps each keyword term to the positions where it occurs
+    and `length` is the total number of tokens.
+    """
+    if not length or not keyword_tokens:
+        return 0
+        
+    score = 0
+    keyword_counts = {}
+    for keyword in keyword_tokens:
+        keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
+    
+    # Calculate keyword coverage (how many unique keywords are found)
+    found_keywords = [keyword for keyword in keyword_counts if term_positions.get(keyword)]
+    keyword_coverage = len(found_keywords) / len(keyword_counts)
+    
+    # Base score on keyword coverage
+    score += keyword_coverage * 5
+    
+    # Count exact phrase occurrences once, using the positions of the first keyword
+    phrase_matches = 0
+    if all(term_positions.get(keyword) for keyword in keyword_counts):
+        position_sets = {keyword: set(term_positions[keyword]) for keyword in keyword_counts}
+        for start in term_positions[keyword_tokens[0]]:
+            if all(start + offset in position_sets[keyword]
+                   for offset, keyword in enumerate(keyword_tokens)):
+                phrase_matches += 1
+    
+    # Count exact matches with a bonus per found keyword for each phrase match
+    for keyword in found_keywords:
+        score += len(term_positions[keyword]) * 3  # Base score for each match
+        score += phrase_matches * 5  # Bonus for exact phrase match
+    
+    # Title matches are very important (first 10 tokens are considered title)
+    title_matches = sum(1 for keyword in found_keywords if min(term_positions[keyword]) < 10)
+    if title_matches > 0:
+        score += title_matches * 4  # Higher weight for title matches
+    
+    # Check for semantic similarity (simple word overlap)
+    overlap = sum(min(len(term_positions[keyword]), keyword_counts[keyword]) for keyword in found_keywords)
+    score += overlap * 2
+    
+    # Penalize if the text is too long (to avoid irrelevant long articles)
+    if length > 1000:  # Arbitrary threshold
+        score *= 0.8
+    
+    return score
+
+def rank_classic(index, doc_ids, term_postings, keyword_tokens):
+    """Score candidate documents one by one with the classic relevance score.
+
+    Returns a list of (doc_id, score, field_scores) for documents that reach
+    SEARCH_SETTINGS['min_relevance_score'].
+    """
+    ranked = []
+    for doc_id in doc_ids:
+        doc = index.get_document(doc_id)
+        if doc is None:
+            continue
+        
+        field_scores = {}
+        for field in INDEXED_FIELDS:
+            term_positions = {
+                term: postings[doc_id].get(field, ())
+                for term, postings in term_postings.items() if doc_id in postings
+            }
+            field_scores[field] = score_positions(term_positions, doc.length(field), keyword_tokens)
+        
+        # Weighted combination of scores
+        score = sum(field_scores[field] * FIELD_WEIGHTS[field] for field in INDEXED_FIELDS)
+        
+        # Only include results with a minimum relevance score
+        if score >= SEARCH_SETTINGS['min_relevance_score']:
+            ranked.append((doc_id, score, field_scores))
+    return ranked
+
+def rank_bm25(index, doc_ids, term_postings, keyword_tokens):
+    """Score all candidate documents at once with a field-weighted BM25 (BM25F).
+
+    Builds a documents x query-terms frequency matrix per field, normalizes
+    each by field length, combines the fields with the SEARCH_SETTINGS weights
+    and applies BM25 saturation and IDF in a single vectorized pass.
+
+    Returns a list of (doc_id, score, field_scores) for documents with a
+    positive score of at least SEARCH_SETTINGS['bm25_min_score_ratio'] times
+    the best score. BM25 scores have no fixed scale (a term found in most
+    documents has an IDF near zero), so the floor is relative to the query.
+    """
+    docs = []
+    for doc_id in doc_ids:
+        doc = index.get_document(doc_id)
+        if doc is not None:
+            docs.append((doc_id, doc))
+    if not docs:
+        return []
+    
+    k1 = SEARCH_SETTINGS['bm25_k1']
+    b = SEARCH_SETTINGS['bm25_b']
+    terms = list(dict.fromkeys(keyword_tokens))
+    rows = {doc_id: i for i, (doc_id, _) in enumerate(docs)}
+    total_docs = len(index)
+    average_lengths = index.average_field_lengths()
+    
+    # Query term weights: IDF times the number of times the term appears in the query
+    query_weights = np.array([
+        math.log(1 + (total_docs - len(term_postings[term]) + 0.5) / (len(term_postings[term]) + 0.5))
+        * keyword_tokens.count(term)
+        for term in terms
+    ])
+    
+    def saturate(tf):
+        return (tf * (k1 + 1)) / (tf + k1)
+    
+    combined = np.zeros((len(docs), len(terms)))
+    field_scores = {}
+    for field in INDEXED_FIELDS:
+        tf = np.zeros((len(docs), len(terms)))
+        for j, term in enumerate(terms):
+            for doc_id, fields in term_postings[term].items():
+                i = rows.get(doc_id)
+                if i is not None:
+                    tf[i, j] = len(fields.get(field, ()))
+        
+        lengths = np.array([doc.length(field) for _, doc in docs], dtype=float)
+        average = average_lengths[field] or 1.0
+        weighted = FIELD_WEIGHTS[field] * tf / (1 - b + b * lengths / average)[:, None]
+        combined += weighted
+        field_scores[field] = saturate(weighted) @ query_weights
+    
+    scores = saturate(combined) @ query_weights
+    
+    floor = scores.max() * SEARCH_SETTINGS['bm25_min_score_ratio']
+    ranked = []
+    for i in np.flatnonzero((scores > 0) & (scores >= floor)):
+        ranked.append((docs[i][0], float(scores[i]), {
+            field: float(field_scores[field][i]) for field in INDEXED_FIELDS
+        }))
+    return ranked
+
+# Selectable ranking engines, by name
+RANKERS = {
+    'classic': rank_classic,
+    'bm25': rank_bm25
+}
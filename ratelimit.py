@@ -0,0 +1,123 @@
+"""Per-host rate limiting for feed fetches in the News Genie application."""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+from config import RATE_LIMIT
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class HostRateLimiter:
+    """Non-blocking, thread-safe token-bucket limiter keyed by host.
+
+    `limits` maps host patterns to {'min_interval': seconds, 'burst': tokens}.
+    A pattern matches a host exactly, as a parent domain ('yahoo.com' matches
+    'news.yahoo.com') or as a whole label ('yahoo' matches 'finance.yahoo.co.jp').
+    Callers never sleep: a fetch that has to wait is recorded as deferred
+    until its host has a token again, and should be retried after that.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._buckets = {}
+        # feed_url -> (host, monotonic time it may be fetched again)
+        self._deferred = {}
+        self._stats = {}
+
+    def match(self, host):
+        """Return the configured pattern that applies to a host, or None"""
+        host = (host or '').lower()
+        labels = host.split('.')
+        for pattern in self.limits:
+            pattern_lower = pattern.lower()
+            if host == pattern_lower or host.endswith('.' + pattern_lower) or pattern_lower in labels:
+                return pattern
+        return None
+
+    def try_acquire(self, url):
+        """Try to take a fetch slot for a URL.
+
+        Returns 0.0 if the fetch may go ahead now, otherwise the number of
+        seconds to wait; the URL is then deferred until that time.
+        """
+        host = urlparse(url).hostname or ''
+        pattern = self.match(host)
+        if pattern is None:
+            return 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                limit = self.limits[pattern]
+                bucket = TokenBucket(1.0 / limit['min_interval'], limit.get('burst', 1), now)
+                self._buckets[host] = bucket
+            stats = self._stats.setdefault(host, {'pattern': pattern, 'acquired': 0, 'deferred': 0,
+                                                  'deferred_seconds': 0.0})
+            wait_time = bucket.try_take(now)
+            if wait_time == 0.0:
+                stats['acquired'] += 1
+                self._deferred.pop(url, None)
+            else:
+                stats['deferred'] += 1
+                stats['deferred_seconds'] += wait_time
+                self._deferred[url] = (host, now + wait_time)
+            return wait_time
+
+    def deferred_for(self, url):
+        """Return the seconds left before a deferred URL may be fetched (0.0 if not deferred)"""
+        with self._lock:
+            entry = self._deferred.get(url)
+            if entry is None:
+                return 0.0
+            remaining = entry[1] - time.monotonic()
+            if remaining <= 0:
+                del self._deferred[url]
+                return 0.0
+            return remaining
+
+    def is_deferred(self, url):
+        """Check whether a URL is waiting for its host's rate limit"""
+        return self.deferred_for(url) > 0
+
+    def status(self):
+        """Return per-host queue depth, wait time and counters"""
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for host, stats in self._stats.items():
+                waits = [ready_at - now for deferred_host, ready_at in self._deferred.values()
+                         if deferred_host == host and ready_at > now]
+                bucket = self._buckets[host]
+                bucket._refill(now)
+                result[host] = dict(
+                    stats,
+                    queue_depth=len(waits),
+                    max_wait_seconds=max(waits, default=0.0),
+                    tokens=bucket.tokens
+                )
+            return result
+
+# Shared limiter for all feed fetches
+rate_limiter = HostRateLimiter(RATE_LIMIT)
@@ -0,0 +1,172 @@
+"""Feed registry for the News Genie application."""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; fall back to in-process locking only
+    fcntl = None
+
+from utils import logger
+
+class FeedRegistry:
+    """Cached view of the feeds file with atomic, locked writes.
+
+    The file is parsed again only when its mtime, size or inode changes, so
+    repeated reads cost a single os.stat. Writes take an exclusive file lock
+    (shared by every worker process), re-read the file, apply the change and
+    replace the file atomically via a temporary file and rename.
+    """
+
+    def __init__(self, path, default_feeds):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.default_feeds = default_feeds
+        self._lock = threading.RLock()
+        self._signature = None
+        # Error of the last failed read, cleared once the file is read again
+        self._read_error = None
+        self._feeds = []
+        self._by_url = {}
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """Hold the in-process lock and, where supported, an inter-process file lock"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat_signature(self):
+        """Return what identifies the current version of the file, or None if it is missing"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _set_feeds(self, feeds, signature):
+        """Replace the cached feeds; the caller must hold the lock"""
+        self._feeds = feeds
+        self._by_url = {feed['url']: feed for feed in feeds}
+        self._signature = signature
+
+    def _reload(self):
+        """Re-read the file if it changed since it was last read; the caller must hold the lock"""
+        signature = self._stat_signature()
+        if signature is not None and signature == self._signature:
+            return
+
+        if signature is None:
+            logger.info(f"Feeds file not found. Creating default at {self.path}")
+            self._write(list(self.default_feeds))
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                feeds = json.load(f)
+            self._set_feeds(feeds, signature)
+            self._read_error = None
+            logger.info(f"Loaded {len(feeds)} feeds from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading feeds from {self.path}: {str(e)}", exc_info=True)
+            self._read_error = e
+            if self._signature is None:
+                self._set_feeds(list(self.default_feeds), None)
+
+    def _write(self, feeds):
+        """Atomically replace the file with the given feeds; the caller must hold the lock"""
+        directory = os.path.dirname(self.path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.feeds-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(feeds, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._set_feeds(feeds, self._stat_signature())
+        self._read_error = None
+        logger.info(f"Saved {len(feeds)} feeds to {self.path}")
+
+    def all(self, strict=False):
+        """Return a copy of every feed.
+
+        Normally a file that cannot be parsed leaves the last feeds read (or
+        the defaults) in place; with `strict` set its error is raised instead.
+        """
+        with self._file_lock(exclusive=False):
+            self._reload()
+            if strict and self._read_error is not None:
+                raise self._read_error
+            return [dict(feed) for feed in self._feeds]
+
+    def get(self, url):
+        """Return a copy of the feed with the given URL, or None"""
+        with self._file_lock(exclusive=False):
+            self._reload()
+            feed = self._by_url.get(url)
+            return dict(feed) if feed is not None else None
+
+    def save(self, feeds):
+        """Replace the whole feed list"""
+        with self._file_lock(exclusive=True):
+            self._write([dict(feed) for feed in feeds])
+
+    def add(self, feed):
+        """Add a feed; returns False if a feed with the same URL already exists"""
+        with self._file_lock(exclusive=True):
+            self._reload()
+            if feed['url'] in self._by_url:
+                return False
+            self._write([dict(existing) for existing in self._feeds] + [dict(feed)])
+            return True
+
+    def add_many(self, feeds):
+        """Add several feeds in a single write, skipping URLs that already exist.
+
+        Returns the URLs of the feeds that were added.
+        """
+        with self._file_lock(exclusive=True):
+            self._reload()
+            added = {}
+            for feed in feeds:
+                if feed['url'] not in self._by_url and feed['url'] not in added:
+                    added[feed['url']] = dict(feed)
+            if added:
+                self._write([dict(existing) for existing in self._feeds] + list(added.values()))
+            return list(added)
+
+    def remove(self, url):
+        """Remove a feed; returns False if no feed has the URL"""
+        with self._file_lock(exclusive=True):
+            self._reload()
+            if url not in self._by_url:
+                return False
+            self._write([dict(feed) for feed in self._feeds if feed['url'] != url])
+            return True
+
+    def update(self, url, **fields):
+        """Update fields of a feed; returns False if no feed has the URL"""
+        with self._file_lock(exclusive=True):
+            self._reload()
+            if url not in self._by_url:
+                return False
+            self._write([
+                dict(feed, **fields) if feed['url'] == url else dict(feed)
+                for feed in self._feeds
+            ])
+            return True
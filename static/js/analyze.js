@@ -2,11 +2,58 @@
  * Article analysis functionality for News Genie
  */
 
-// Analyze an article with Claude API
+// Analyze an article with Claude API, rendering the analysis as it streams in
 function analyzeArticle(apiKey, content) {
-    document.getElementById('analysisResult').innerHTML = '';
-    document.getElementById('analysisLoadingSpinner').style.display = 'flex';
-    
+    const resultElement = document.getElementById('analysisResult');
+    const spinner = document.getElementById('analysisLoadingSpinner');
+    resultElement.innerHTML = '';
+    spinner.style.display = 'flex';
+
+    let analysis = '';
+    let analysisElement = null;
+
+    // Append a chunk of analysis text to the result box
+    function renderChunk(text) {
+        if (!analysisElement) {
+            spinner.style.display = 'none';
+            resultElement.innerHTML = '<div class="border p-3 rounded"></div>';
+            analysisElement = resultElement.firstElementChild;
+        }
+        analysis += text;
+        analysisElement.innerHTML = analysis.replace(/\n/g, '<br>');
+    }
+
+    function renderError(message) {
+        spinner.style.display = 'none';
+        resultElement.insertAdjacentHTML('beforeend', `
+            <div class="alert alert-danger">${message}</div>
+        `);
+    }
+
+    // Handle one server-sent event ("event: name" and "data: json" lines)
+    function handleEvent(frame) {
+        let event = 'message';
+        let data = '';
+        frame.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) {
+                event = line.slice(7);
+            } else if (line.startsWith('data: ')) {
+                data += line.slice(6);
+            }
+        });
+        if (!data) {
+            return;
+        }
+        const payload = JSON.parse(data);
+        if (event === 'error') {
+            renderError(payload.error);
+        } else if (event === 'done') {
+            spinner.style.display = 'none';
+        } else if (payload.text) {
+            renderChunk(payload.text);
+        }
+    }
+
     fetch('/analyze', {
         method: 'POST',
         headers: {
@@ -14,29 +61,41 @@ function analyzeArticle(apiKey, content) {
         },
         body: JSON.stringify({
             api_key: apiKey,
-            content: content
+            content: content,
+            stream: true
         })
     })
-    .then(response => response.json())
-    .then(data => {
-        document.getElementById('analysisLoadingSpinner').style.display = 'none';
-        if (data.analysis) {
-            document.getElementById('analysisResult').innerHTML = `
-                <div class="border p-3 rounded">
-                    ${data.analysis.replace(/\n/g, '<br>')}
-                </div>
-            `;
-        } else if (data.error) {
-            document.getElementById('analysisResult').innerHTML = `
-                <div class="alert alert-danger">${data.error}</div>
-            `;
+    .then(response => {
+        if (!response.ok) {
+            return response.json().then(data => {
+                throw new Error(data.error || `HTTP error ${response.status}`);
+            });
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        // Read the stream chunk by chunk, handling each complete event as it arrives
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    spinner.style.display = 'none';
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    handleEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+                return read();
+            });
         }
+        return read();
     })
     .catch(error => {
         console.error('Error analyzing article:', error);
-        document.getElementById('analysisLoadingSpinner').style.display = 'none';
-        document.getElementById('analysisResult').innerHTML = `
-            <div class="alert alert-danger">Error analyzing article: ${error.message}</div>
-        `;
+        renderError(`Error analyzing article: ${error.message}`);
     });
-} 
\ No newline at end of file
+}
@@ -6,6 +6,8 @@
 let currentPage = 1;
 let isLoading = false;
 let hasMoreStories = true;
+let nextCursor = null;
+let storyStream = null;
 let currentArticleContent = '';
 let analysisModalArticleTitle = '';
 
@@ -10,11 +10,13 @@ function loadStories() {
         // Clear existing stories
         const storiesContainer = document.getElementById('storiesContainer');
         storiesContainer.innerHTML = '<div class="alert alert-info">No feeds selected. Please select at least one feed to view stories.</div>';
+        closeStoryStream();
         return; // Don't try to load when no feeds are selected
     }
 
     hasMoreStories = true;
     currentPage = 1;
+    nextCursor = null;
     isLoading = true;
     allStories = [];
 
@@ -50,11 +52,15 @@ function loadStories() {
                 }
                 
                 hasMoreStories = currentPage < data.total_pages;
+                nextCursor = data.next_cursor;
                 currentPage++;
             } else {
                 storiesContainer.innerHTML = '<div class="alert alert-info">No stories found</div>';
                 hasMoreStories = false;
             }
+
+            // Receive stories stored after the newest one shown
+            openStoryStream(selectedFeeds, allStories.length > 0 ? allStories[0] : null);
         })
         .catch(error => {
             console.error('Error loading stories:', error);
@@ -78,7 +84,10 @@ function loadMoreStories() {
     isLoading = true;
     document.getElementById('loadingSpinner').style.display = 'flex';
     
-    let url = `/api/stories?page=${currentPage}`;
+    // Continue from the last story seen when the server provided a cursor
+    let url = nextCursor
+        ? `/api/stories?before=${encodeURIComponent(nextCursor)}`
+        : `/api/stories?page=${currentPage}`;
     
     // Add selected feeds to query
     const feedsParam = selectedFeeds.map(feed => encodeURIComponent(feed)).join(',');
@@ -92,7 +101,8 @@ function loadMoreStories() {
             
             if (data.stories && data.stories.length > 0) {
                 appendStories(data.stories);
-                hasMoreStories = currentPage < data.total_pages;
+                hasMoreStories = data.next_cursor !== null;
+                nextCursor = data.next_cursor;
                 currentPage++;
             } else {
                 hasMoreStories = false;
@@ -170,4 +180,49 @@ function appendStories(newStories) {
     } else {
         displayStories(allStories);
     }
-} 
\ No newline at end of file
+}
+
+// Close the live story stream, if one is open
+function closeStoryStream() {
+    if (storyStream) {
+        storyStream.close();
+        storyStream = null;
+    }
+}
+
+// Open a live stream of the stories stored after the given story
+function openStoryStream(selectedFeeds, newestStory) {
+    closeStoryStream();
+    if (!window.EventSource) return;
+
+    let url = `/api/stories/stream?feeds=${selectedFeeds.map(feed => encodeURIComponent(feed)).join(',')}`;
+    if (newestStory) {
+        // Same 'published_ts,feed_url,id' cursor the server uses as event IDs
+        const cursor = `${newestStory.published_ts},${encodeURIComponent(newestStory.feed_url)},${newestStory.id}`;
+        url += `&after=${encodeURIComponent(cursor)}`;
+    }
+
+    storyStream = new EventSource(url);
+    storyStream.addEventListener('story', event => {
+        prependStory(JSON.parse(event.data));
+    });
+    storyStream.addEventListener('reset', () => {
+        // Too many stories were missed while disconnected; reload the timeline
+        closeStoryStream();
+        loadStories();
+    });
+}
+
+// Add a story from the live stream to the top of the list
+function prependStory(story) {
+    if (allStories.some(existing => existing.feed_url === story.feed_url && existing.id === story.id)) return;
+
+    allStories = [story, ...allStories];
+    processStoriesForFilters(allStories);
+
+    if (activeFilters.size > 0) {
+        applyFilters();
+    } else {
+        displayStories(allStories);
+    }
+}
@@ -0,0 +1,611 @@
+"""Persistent story storage for the News Genie application."""
+
+import heapq
+import sqlite3
+import sys
+import threading
+import time
+from itertools import islice
+from urllib.parse import quote
+
+from config import STORE_FILE
+from utils import logger, parse_timestamp
+
+STORY_FIELDS = ['id', 'title', 'link', 'description', 'content', 'published', 'published_ts', 'source', 'feed_url',
+                'cluster_id']
+
+# Columns read for story listings; content is loaded only for the stories that are returned
+LISTING_FIELDS = ['rowid'] + [field for field in STORY_FIELDS if field != 'content']
+
+# Content of a story that has not been read from the store yet
+_UNLOADED = object()
+
+# Shared store instance (created on first use)
+_store = None
+_store_lock = threading.Lock()
+
+class Story:
+    """A stored story.
+
+    Fields live in slots rather than a per-story dict, and the source and
+    feed URL strings are interned so every story of a feed shares them.
+    Stories read without their content load it from the store on first
+    access. Search results also carry their relevance and per-field
+    scores. to_dict builds the JSON shape served by the API.
+    """
+
+    __slots__ = ('rowid', 'id', 'title', 'link', 'description', '_content', 'published', 'published_ts',
+                 'source', 'feed_url', 'cluster_id', 'relevance_score', 'field_scores')
+
+    def __init__(self, id, title, link, description, content, published, published_ts, source, feed_url,
+                 cluster_id=None, rowid=None):
+        self.rowid = rowid
+        self.id = id
+        self.title = title
+        self.link = link
+        self.description = description
+        self._content = content
+        self.published = published
+        self.published_ts = published_ts
+        self.source = sys.intern(source) if source else source
+        self.feed_url = sys.intern(feed_url)
+        self.cluster_id = cluster_id
+        self.relevance_score = None
+        self.field_scores = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a story from a stories table row, which may omit rowid and content"""
+        columns = row.keys()
+        return cls(
+            row['id'], row['title'], row['link'], row['description'],
+            row['content'] if 'content' in columns else _UNLOADED,
+            row['published'], row['published_ts'], row['source'], row['feed_url'],
+            row['cluster_id'], row['rowid'] if 'rowid' in columns else None
+        )
+
+    @property
+    def content(self):
+        """The story content, read from the store on first access if it was not loaded"""
+        if self._content is _UNLOADED:
+            self._content = get_store().get_contents([self.rowid]).get(self.rowid, '')
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+    def get(self, field, default=None):
+        """Return a field by name, like dict.get, so stories and processed entries can be handled alike"""
+        return getattr(self, field, default)
+
+    def to_dict(self):
+        """Return the story as served by the API"""
+        story = {field: getattr(self, field) for field in STORY_FIELDS}
+        if self.relevance_score is not None:
+            story['relevance_score'] = self.relevance_score
+            story['match_details'] = {
+                'title_score': self.field_scores['title'],
+                'description_score': self.field_scores['description'],
+                'content_score': self.field_scores['content']
+            }
+        return story
+
+    def __repr__(self):
+        return f"Story({self.feed_url!r}, {self.id!r})"
+
+class StoryStore:
+    """SQLite-backed store of processed feed entries and per-feed refresh state"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the tables used by the store if they do not exist yet"""
+        with self._lock, self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS stories (
+                    feed_url TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    title TEXT,
+                    link TEXT,
+                    description TEXT,
+                    content TEXT,
+                    published TEXT,
+                    source TEXT,
+                    fetched_at REAL
+                );
+
+                CREATE TABLE IF NOT EXISTS feed_state (
+                    feed_url TEXT PRIMARY KEY,
+                    last_attempt REAL,
+                    last_success REAL,
+                    last_error TEXT,
+                    story_count INTEGER DEFAULT 0
+                );
+
+                CREATE TABLE IF NOT EXISTS analyses (
+                    content_hash TEXT PRIMARY KEY,
+                    model TEXT,
+                    analysis TEXT,
+                    created_at REAL
+                );
+            ''')
+            self._add_missing_columns('feed_state', {
+                'etag': 'TEXT',
+                'last_modified': 'TEXT',
+                'body_size': 'INTEGER',
+                'version': 'INTEGER DEFAULT 0',
+                'last_new': 'INTEGER',
+                'last_updated': 'INTEGER',
+                'last_unchanged': 'INTEGER',
+                'last_expired': 'INTEGER'
+            })
+            added = self._add_missing_columns('stories', {
+                'published_ts': 'REAL',
+                'cluster_id': 'TEXT',
+                'minhash': 'BLOB',
+                'entry_hash': 'TEXT',
+                'last_seen': 'REAL'
+            })
+            if 'published_ts' in added:
+                self._backfill_published_ts()
+            if 'cluster_id' in added:
+                # Stories stored before deduplication each form their own cluster until refreshed
+                self._conn.execute("UPDATE stories SET cluster_id = 'story-' || rowid")
+            if 'last_seen' in added:
+                # Stories stored before retention was tracked were last seen when fetched
+                self._conn.execute('UPDATE stories SET last_seen = fetched_at')
+            # Timeline order used for paging: newest first, ties broken by story ID and
+            # then feed URL (syndicated copies can share both timestamp and ID).
+            # The per-feed timeline also serves lookups by feed URL alone.
+            self._conn.execute('DROP INDEX IF EXISTS idx_stories_published')
+            self._conn.execute('DROP INDEX IF EXISTS idx_stories_feed')
+            self._conn.execute('DROP INDEX IF EXISTS idx_stories_timeline')
+            self._conn.execute('DROP INDEX IF EXISTS idx_stories_cluster')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_stories_timeline_key ON stories (published_ts, id, feed_url)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_stories_feed_timeline ON stories (feed_url, published_ts, id)'
+            )
+            # Finds the earliest copy of a story among its near-duplicates
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_stories_cluster_key ON stories (cluster_id, published_ts, id, feed_url)'
+            )
+
+    def _add_missing_columns(self, table, columns):
+        """Add columns introduced after a table was first created; returns the names added"""
+        existing = {row['name'] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+        added = []
+        for name, column_type in columns.items():
+            if name not in existing:
+                self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+                added.append(name)
+        return added
+
+    def _backfill_published_ts(self):
+        """Fill in timestamps for stories stored before they were recorded"""
+        rows = self._conn.execute('SELECT rowid, published FROM stories').fetchall()
+        self._conn.executemany(
+            'UPDATE stories SET published_ts = ? WHERE rowid = ?',
+            [(parse_timestamp(row['published']), row['rowid']) for row in rows]
+        )
+
+    def get_entry_hashes(self, feed_url):
+        """Return the hashes of the raw entries the stored stories of a feed were processed from"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT entry_hash FROM stories WHERE feed_url = ? AND entry_hash IS NOT NULL', (feed_url,)
+            ).fetchall()
+        return {row['entry_hash'] for row in rows}
+
+    def update_feed_stories(self, feed_url, entries, seen_ids, validators=None, retention=0, max_stories=None):
+        """Apply one refresh of a feed to its stored stories.
+
+        `entries` are the feed's new and changed processed entries and
+        `seen_ids` the IDs of every entry the feed currently lists. New
+        entries are inserted and changed ones updated in place, keeping their
+        row ID. Stories the feed no longer lists are kept until `retention`
+        seconds after they were last seen; beyond `max_stories` stories per
+        feed, the oldest of them are expired early. `validators` holds the
+        ETag/Last-Modified of the response, used for conditional requests on
+        the next refresh. The feed's story version is bumped only if its
+        stories changed.
+
+        Returns a dict with the 'new', 'updated', 'unchanged' and 'expired'
+        story counts, the (row ID, entry) pairs 'written', the row IDs of
+        the inserted stories as 'new_rowids', the 'expired_rowids' and
+        'expired_ids', the feed's 'old_version' and
+        'version', and whether an error left by an earlier refresh was
+        'cleared'.
+        """
+        now = time.time()
+        validators = validators or {}
+        seen_ids = set(seen_ids)
+        with self._lock, self._conn:
+            state = self._conn.execute(
+                'SELECT last_error, version FROM feed_state WHERE feed_url = ?', (feed_url,)
+            ).fetchone()
+            stored = self._conn.execute(
+                'SELECT rowid, id, published_ts, last_seen FROM stories WHERE feed_url = ?', (feed_url,)
+            ).fetchall()
+            stored_rowids = {}
+            for row in stored:
+                stored_rowids.setdefault(row['id'], []).append(row['rowid'])
+
+            written = []
+            new_rowids = []
+            new = updated = 0
+            for entry in entries:
+                values = (entry['title'], entry['link'], entry['description'], entry['content'],
+                          entry['published'], entry['published_ts'], entry['source'], now, now,
+                          entry.get('cluster_id'), entry.get('minhash'), entry['entry_hash'])
+                rowids = stored_rowids.get(entry['id'])
+                if rowids:
+                    self._conn.executemany(
+                        'UPDATE stories SET title = ?, link = ?, description = ?, content = ?, published = ?, '
+                        'published_ts = ?, source = ?, fetched_at = ?, last_seen = ?, cluster_id = ?, '
+                        'minhash = ?, entry_hash = ? WHERE rowid = ?',
+                        [values + (rowid,) for rowid in rowids]
+                    )
+                    updated += 1
+                else:
+                    cursor = self._conn.execute(
+                        'INSERT INTO stories (feed_url, id, title, link, description, content, published, '
+                        'published_ts, source, fetched_at, last_seen, cluster_id, minhash, entry_hash) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (feed_url, entry['id']) + values
+                    )
+                    rowids = [cursor.lastrowid]
+                    new_rowids.append(cursor.lastrowid)
+                    new += 1
+                written += [(rowid, entry) for rowid in rowids]
+            # Stories without a cluster (deduplication disabled) stand alone
+            self._conn.execute(
+                "UPDATE stories SET cluster_id = 'story-' || rowid WHERE feed_url = ? AND cluster_id IS NULL",
+                (feed_url,)
+            )
+
+            written_ids = {entry['id'] for entry in entries}
+            unchanged = [rowid for story_id, rowids in stored_rowids.items()
+                         if story_id in seen_ids and story_id not in written_ids for rowid in rowids]
+            for start in range(0, len(unchanged), 500):
+                chunk = unchanged[start:start + 500]
+                self._conn.execute(
+                    f'UPDATE stories SET last_seen = ? WHERE rowid IN ({",".join("?" * len(chunk))})',
+                    [now] + chunk
+                )
+
+            # Expire stories that left the feed once their retention ends, oldest first if over the cap
+            vanished = sorted((row for row in stored if row['id'] not in seen_ids),
+                              key=lambda row: (row['published_ts'] or 0.0, row['rowid']))
+            story_count = len(stored) + new
+            expired = []
+            for row in vanished:
+                over_cap = max_stories is not None and story_count > max_stories
+                if over_cap or (row['last_seen'] or 0.0) <= now - retention:
+                    expired.append(row)
+                    story_count -= 1
+            for start in range(0, len(expired), 500):
+                chunk = [row['rowid'] for row in expired[start:start + 500]]
+                self._conn.execute(f'DELETE FROM stories WHERE rowid IN ({",".join("?" * len(chunk))})', chunk)
+
+            old_version = state['version'] if state else None
+            version = old_version or 0
+            if new or updated or expired:
+                version += 1
+            unchanged_count = len(seen_ids & set(stored_rowids)) - updated
+            self._conn.execute(
+                'INSERT INTO feed_state (feed_url, last_attempt, last_success, last_error, story_count, '
+                'etag, last_modified, body_size, version, last_new, last_updated, last_unchanged, last_expired) '
+                'VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(feed_url) DO UPDATE SET last_attempt = excluded.last_attempt, '
+                'last_success = excluded.last_success, last_error = NULL, story_count = excluded.story_count, '
+                'etag = excluded.etag, last_modified = excluded.last_modified, body_size = excluded.body_size, '
+                'version = excluded.version, last_new = excluded.last_new, last_updated = excluded.last_updated, '
+                'last_unchanged = excluded.last_unchanged, last_expired = excluded.last_expired',
+                (feed_url, now, now, story_count, validators.get('etag'), validators.get('last_modified'),
+                 validators.get('body_size'), version, new, updated, unchanged_count, len(expired))
+            )
+        changes = {
+            'new': new,
+            'updated': updated,
+            'unchanged': unchanged_count,
+            'expired': len(expired),
+            'written': written,
+            'new_rowids': new_rowids,
+            'expired_rowids': [row['rowid'] for row in expired],
+            'expired_ids': list(dict.fromkeys(row['id'] for row in expired)),
+            'old_version': old_version,
+            'version': version,
+            'cleared': bool(state and state['last_error'])
+        }
+        logger.info(f"Stored feed {feed_url}: {new} new, {updated} updated, {unchanged_count} unchanged, "
+                    f"{len(expired)} expired stories")
+        return changes
+
+    def record_not_modified(self, feed_url):
+        """Record a refresh where the server reported the feed unchanged.
+
+        Returns True if this cleared an error left by an earlier refresh.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT last_error FROM feed_state WHERE feed_url = ?', (feed_url,)
+            ).fetchone()
+            self._conn.execute(
+                'UPDATE feed_state SET last_attempt = ?, last_success = ?, last_error = NULL WHERE feed_url = ?',
+                (now, now, feed_url)
+            )
+        return bool(row and row[0])
+
+    def get_validators(self, feed_url):
+        """Return the cache validators saved for a feed's last full response"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, body_size FROM feed_state WHERE feed_url = ?',
+                (feed_url,)
+            ).fetchone()
+        return dict(row) if row else {}
+
+    def record_failure(self, feed_url, error):
+        """Record a failed refresh attempt for a feed, keeping its previous stories.
+
+        Returns True if the feed was not already listed as failed.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT last_error FROM feed_state WHERE feed_url = ?', (feed_url,)
+            ).fetchone()
+            self._conn.execute(
+                'INSERT INTO feed_state (feed_url, last_attempt, last_error) VALUES (?, ?, ?) '
+                'ON CONFLICT(feed_url) DO UPDATE SET last_attempt = excluded.last_attempt, '
+                'last_error = excluded.last_error',
+                (feed_url, now, error)
+            )
+        return not (row and row[0])
+
+    def remove_feed(self, feed_url):
+        """Delete all stories and state stored for a feed"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM stories WHERE feed_url = ?', (feed_url,))
+            self._conn.execute('DELETE FROM feed_state WHERE feed_url = ?', (feed_url,))
+        logger.info(f"Removed stored stories for feed {feed_url}")
+
+    def get_feed_states(self, feed_urls=None):
+        """Return the refresh state of the given feeds (default: every stored feed), keyed by feed URL"""
+        with self._lock:
+            if feed_urls is None:
+                rows = self._conn.execute('SELECT * FROM feed_state').fetchall()
+            else:
+                feed_urls = list(feed_urls)
+                placeholders = ','.join('?' * len(feed_urls))
+                rows = self._conn.execute(
+                    f'SELECT * FROM feed_state WHERE feed_url IN ({placeholders})',
+                    feed_urls
+                ).fetchall()
+        return {row['feed_url']: dict(row) for row in rows}
+
+    def _timeline_page(self, feed_url, before, limit, offset=0):
+        """Read stories in timeline order, from one feed or (feed_url None) all feeds"""
+        query = f'SELECT {", ".join(LISTING_FIELDS)} FROM stories '
+        conditions = []
+        params = []
+        if feed_url is not None:
+            conditions.append('feed_url = ?')
+            params.append(feed_url)
+        if before is not None and feed_url is None:
+            conditions.append('(published_ts, id, feed_url) < (?, ?, ?)')
+            params += list(before)
+        elif before is not None:
+            # Within one feed the story ID settles ties, so the per-feed index is
+            # used; this feed's copy of the cursor story follows the cursor if
+            # its feed URL sorts lower
+            conditions.append('(published_ts, id) <= (?, ?)' if feed_url < before[2] else '(published_ts, id) < (?, ?)')
+            params += [before[0], before[1]]
+        if conditions:
+            query += 'WHERE ' + ' AND '.join(conditions) + ' '
+        query += 'ORDER BY published_ts DESC, id DESC, feed_url DESC LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        return [Story.from_row(row) for row in self._conn.execute(query, params)]
+
+    def _load_contents(self, stories):
+        """Read the content of the given stories in one query"""
+        contents = self.get_contents(story.rowid for story in stories)
+        for story in stories:
+            story.content = contents.get(story.rowid, '')
+        return stories
+
+    def get_stories(self, page, items_per_page, feed_urls, before=None, collapse=False):
+        """Return one page of stories from the given feeds, newest first, and the total count.
+
+        With `before` set to a (published_ts, id, feed_url) cursor, the page starts right
+        after that story and `page` is ignored, so SQLite seeks to the cursor
+        instead of skipping over earlier pages.
+
+        When only some feeds are selected, each selected feed's timeline is
+        read through the per-feed index (at most offset + page size rows each)
+        and the sorted lists are combined with a k-way heap merge, so the cost
+        follows the number of selected feeds, not the number of subscriptions.
+
+        With `collapse` set, near-duplicate stories are returned once: only
+        the earliest copy of each cluster within the selected feeds is listed,
+        and the total counts clusters rather than stories.
+        """
+        feed_urls = list(dict.fromkeys(feed_urls))
+        if not feed_urls:
+            return [], 0
+
+        placeholders = ','.join('?' * len(feed_urls))
+        offset = 0 if before is not None else (page - 1) * items_per_page
+        if collapse:
+            return self._collapsed_page(feed_urls, before, items_per_page, offset)
+
+        with self._lock:
+            selected = self._conn.execute(
+                f'SELECT feed_url, story_count FROM feed_state '
+                f'WHERE feed_url IN ({placeholders}) AND story_count > 0',
+                feed_urls
+            ).fetchall()
+            total = sum(row['story_count'] for row in selected)
+            stored_count = self._conn.execute(
+                'SELECT COUNT(*) FROM feed_state WHERE story_count > 0'
+            ).fetchone()[0]
+
+            if len(selected) == stored_count:
+                # Every feed with stories is selected: read the global timeline directly
+                stories = self._timeline_page(None, before, items_per_page, offset)
+            else:
+                timelines = [
+                    self._timeline_page(row['feed_url'], before, offset + items_per_page)
+                    for row in selected
+                ]
+                merged = heapq.merge(*timelines, key=timeline_key, reverse=True)
+                stories = list(islice(merged, offset, offset + items_per_page))
+            self._load_contents(stories)
+        return stories, total
+
+    def _collapsed_page(self, feed_urls, before, limit, offset):
+        """Read one page of cluster representatives from the given feeds, and the cluster count"""
+        placeholders = ','.join('?' * len(feed_urls))
+        # A story represents its cluster if no selected copy was published before it
+        query = (
+            f'SELECT {", ".join("s." + field for field in LISTING_FIELDS)} FROM stories s '
+            f'WHERE s.feed_url IN ({placeholders}) AND NOT EXISTS ('
+            f'SELECT 1 FROM stories t WHERE t.cluster_id = s.cluster_id '
+            f'AND t.feed_url IN ({placeholders}) '
+            f'AND (t.published_ts, t.id, t.feed_url) < (s.published_ts, s.id, s.feed_url)) '
+        )
+        params = feed_urls + feed_urls
+        if before is not None:
+            query += 'AND (s.published_ts, s.id, s.feed_url) < (?, ?, ?) '
+            params += list(before)
+        query += 'ORDER BY s.published_ts DESC, s.id DESC, s.feed_url DESC LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        with self._lock:
+            stories = self._load_contents([Story.from_row(row) for row in self._conn.execute(query, params)])
+            total = self._conn.execute(
+                f'SELECT COUNT(DISTINCT cluster_id) FROM stories WHERE feed_url IN ({placeholders})',
+                feed_urls
+            ).fetchone()[0]
+        return stories, total
+
+    def get_signatures(self):
+        """Return the feed URL, ID, cluster ID and MinHash signature of every story that has one"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT feed_url, id, cluster_id, minhash FROM stories WHERE minhash IS NOT NULL'
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_feed_versions(self):
+        """Return the story version of every stored feed, bumped whenever its stories are replaced"""
+        with self._lock:
+            rows = self._conn.execute('SELECT feed_url, version FROM feed_state').fetchall()
+        return {row['feed_url']: row['version'] or 0 for row in rows}
+
+    def get_feed_documents(self, feed_url):
+        """Return every story of a feed, with its row ID"""
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT rowid, {", ".join(STORY_FIELDS)} FROM stories WHERE feed_url = ?',
+                (feed_url,)
+            ).fetchall()
+        return [Story.from_row(row) for row in rows]
+
+    def get_stories_by_rowids(self, rowids):
+        """Return the stories with the given row IDs, keyed by row ID"""
+        stories = {}
+        rowids = list(rowids)
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT rowid, {", ".join(STORY_FIELDS)} FROM stories WHERE rowid IN ({placeholders})',
+                    chunk
+                ).fetchall()
+            for row in rows:
+                story = Story.from_row(row)
+                stories[story.rowid] = story
+        return stories
+
+    def get_stories_after(self, after, feed_urls=None, limit=100):
+        """Return the stories that follow a (published_ts, id, feed_url) cursor in time, oldest first.
+
+        Only stories of `feed_urls` are read, or of every feed if it is
+        None. At most the `limit` newest such stories are returned.
+        """
+        query = f'SELECT rowid, {", ".join(STORY_FIELDS)} FROM stories WHERE (published_ts, id, feed_url) > (?, ?, ?) '
+        params = list(after)
+        if feed_urls is not None:
+            feed_urls = list(feed_urls)
+            if not feed_urls:
+                return []
+            query += f'AND feed_url IN ({",".join("?" * len(feed_urls))}) '
+            params += feed_urls
+        query += 'ORDER BY published_ts DESC, id DESC, feed_url DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [Story.from_row(row) for row in reversed(rows)]
+
+    def get_contents(self, rowids):
+        """Return the content of the stories with the given row IDs, keyed by row ID"""
+        contents = {}
+        rowids = list(rowids)
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT rowid, content FROM stories WHERE rowid IN ({placeholders})', chunk
+                ).fetchall()
+            contents.update((row['rowid'], row['content']) for row in rows)
+        return contents
+
+    def get_analysis(self, content_hash):
+        """Return the stored analysis for a content hash, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT analysis FROM analyses WHERE content_hash = ?', (content_hash,)
+            ).fetchone()
+        return row['analysis'] if row else None
+
+    def save_analysis(self, content_hash, model, analysis):
+        """Store the analysis of the content with the given hash"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO analyses (content_hash, model, analysis, created_at) VALUES (?, ?, ?, ?)',
+                (content_hash, model, analysis, time.time())
+            )
+
+def timeline_key(story):
+    """Sort key of a story in the timeline (sorted descending), unique across feeds"""
+    return (story.published_ts, story.id, story.feed_url)
+
+def format_cursor(story):
+    """Build the 'published_ts,feed_url,id' cursor that addresses the stories following a story.
+
+    The feed URL is percent-encoded so the first two commas always delimit
+    the fields; the story ID, which may contain commas, comes last.
+    """
+    return f"{story.published_ts},{quote(story.feed_url, safe='')},{story.id}"
+
+def get_store():
+    """Return the shared story store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StoryStore(STORE_FILE)
+        return _store
@@ -0,0 +1,133 @@
+"""Live stream of newly stored stories for the News Genie application."""
+
+import json
+import queue
+import threading
+
+from config import STREAM_SETTINGS
+from utils import logger
+from store import get_store, timeline_key, format_cursor
+
+def story_event(story):
+    """Format a story as a server-sent event whose ID is its cursor"""
+    return f"id: {format_cursor(story)}\nevent: story\ndata: {json.dumps(story.to_dict())}\n\n"
+
+class StorySubscription:
+    """One connected client: its feed filter, its cursor and the events waiting for it"""
+
+    def __init__(self, feed_urls, cursor, queue_size):
+        self.feed_urls = feed_urls
+        self.cursor = cursor
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def wants(self, feed_url):
+        return self.feed_urls is None or feed_url in self.feed_urls
+
+class StoryStream:
+    """Fans newly stored stories out to every connected client.
+
+    Each refresh that stores new stories calls publish() once; the stories
+    are read from the store and formatted as events a single time, and the
+    same batch is queued for every subscriber whose feed filter includes
+    the feed. Each client is sent only the stories that follow its cursor,
+    oldest first, so it can prepend them as they arrive. A client that
+    falls `queue_size` batches behind is disconnected; it reconnects with
+    its last event ID and catches up from the store.
+    """
+
+    def __init__(self, max_clients, queue_size, keepalive, catch_up_limit, reconnect_delay):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.catch_up_limit = catch_up_limit
+        self.reconnect_delay = reconnect_delay
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped_clients': 0}
+
+    def subscribe(self, feed_urls, cursor):
+        """Register a client; returns its subscription, or None if too many clients are connected"""
+        subscription = StorySubscription(
+            frozenset(feed_urls) if feed_urls is not None else None, cursor, self.queue_size
+        )
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, feed_url, rowids):
+        """Send the stories just stored for a feed to the clients following it"""
+        with self._lock:
+            subscribers = [subscription for subscription in self._subscribers if subscription.wants(feed_url)]
+        if not subscribers or not rowids:
+            return
+        stories = sorted(get_store().get_stories_by_rowids(rowids).values(), key=timeline_key)
+        batch = [(timeline_key(story), story_event(story)) for story in stories]
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(batch)
+            except queue.Full:
+                subscription.overflowed = True
+                with self._lock:
+                    self._stats['dropped_clients'] += 1
+        with self._lock:
+            self._stats['published'] += len(batch)
+
+    def events(self, subscription):
+        """Yield the server-sent events of a subscription until the client disconnects.
+
+        Stories stored since the client's cursor are sent first, then stories
+        as feeds are refreshed, with a comment line every `keepalive` seconds
+        to keep the connection open. If more than catch_up_limit stories
+        follow the cursor, a 'reset' event tells the client to reload its
+        timeline instead and the stream ends.
+        """
+        try:
+            yield f"retry: {int(self.reconnect_delay * 1000)}\n\n"
+            if subscription.cursor is not None:
+                stories = get_store().get_stories_after(
+                    subscription.cursor, subscription.feed_urls, self.catch_up_limit + 1
+                )
+                if len(stories) > self.catch_up_limit:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                for story in stories:
+                    subscription.cursor = timeline_key(story)
+                    yield story_event(story)
+            while not subscription.overflowed:
+                try:
+                    batch = subscription.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                events = []
+                for key, event in batch:
+                    if subscription.cursor is None or key > subscription.cursor:
+                        subscription.cursor = key
+                        events.append(event)
+                with self._lock:
+                    self._stats['delivered'] += len(events)
+                yield from events
+            logger.warning("Story stream client fell behind and was disconnected")
+        finally:
+            self.unsubscribe(subscription)
+
+    def status(self):
+        """Return the number of connected clients and event counters"""
+        with self._lock:
+            return dict(self._stats, clients=len(self._subscribers))
+
+# Shared story stream
+story_stream = StoryStream(
+    STREAM_SETTINGS['max_clients'],
+    STREAM_SETTINGS['queue_size'],
+    STREAM_SETTINGS['keepalive'],
+    STREAM_SETTINGS['catch_up_limit'],
+    STREAM_SETTINGS['reconnect_delay']
+)
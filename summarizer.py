@@ -0,0 +1,191 @@
+"""Background story summarization for the News Genie application."""
+
+import queue
+import threading
+import time
+
+import anthropic
+
+from config import SUMMARY_SETTINGS
+from utils import logger
+from store import get_store
+from analysis import analyze_content, content_hash
+from ratelimit import TokenBucket
+
+# API errors that will not succeed on a retry
+PERMANENT_ERRORS = (
+    anthropic.AuthenticationError,
+    anthropic.PermissionDeniedError,
+    anthropic.BadRequestError,
+    anthropic.NotFoundError
+)
+
+class SummaryPipeline:
+    """Pre-analyzes newly ingested stories on a bounded pool of worker threads.
+
+    Stories are queued per refreshed feed. Content that is already analyzed,
+    queued or being analyzed is skipped, so each distinct article is sent to
+    the backend once. Failed analyses are retried with exponential backoff,
+    and an hourly budget caps the number of backend calls. Stories skipped
+    for lack of budget or queue space, and those whose retries ran out, are
+    kept per feed (up to `retry_backlog` each) and offered again on the
+    feed's next refresh, including refreshes that find the feed unchanged.
+    Stories rejected with a permanent API error are not offered again.
+    Results are stored through analysis.analyze_content, so opening the
+    analysis of a story later is a store read.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._queue = queue.Queue(maxsize=settings['queue_size'])
+        self._lock = threading.Lock()
+        # Content hashes queued or being analyzed
+        self._pending = set()
+        # feed_url -> {content hash: content} of skipped stories to offer again
+        self._retry = {}
+        self._budget = TokenBucket(settings['budget_per_hour'] / 3600.0, settings['budget_per_hour'],
+                                   time.monotonic())
+        self._workers = []
+        self._stats = {'queued': 0, 'analyzed': 0, 'failed': 0, 'retries': 0,
+                       'skipped_duplicate': 0, 'skipped_budget': 0, 'skipped_full': 0, 'requeued': 0}
+
+    def start(self):
+        """Start the worker threads"""
+        with self._lock:
+            if self._workers:
+                return
+            for number in range(self.settings['workers']):
+                worker = threading.Thread(target=self._run, name=f'summarizer-{number}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        logger.info(f"Summary pipeline started with {self.settings['workers']} workers")
+
+    def submit(self, feed_url, stories):
+        """Queue a feed's stories whose content has not been analyzed yet, with those skipped earlier.
+
+        Returns the number queued.
+        """
+        store = get_store()
+        batch = {}
+        for story in stories:
+            content = story.get('content') or ''
+            if content.strip():
+                batch.setdefault(content_hash(content), content)
+        with self._lock:
+            skipped = self._retry.pop(feed_url, {})
+            self._stats['requeued'] += len(skipped.keys() - batch.keys())
+        for digest, content in skipped.items():
+            batch.setdefault(digest, content)
+
+        queued = 0
+        for digest, content in batch.items():
+            with self._lock:
+                if digest in self._pending:
+                    self._stats['skipped_duplicate'] += 1
+                    continue
+                self._pending.add(digest)
+            if store.get_analysis(digest) is not None:
+                self._release(digest, 'skipped_duplicate')
+                continue
+            try:
+                self._queue.put_nowait((feed_url, digest, content))
+            except queue.Full:
+                self._release(digest, 'skipped_full')
+                self._keep_for_retry(feed_url, digest, content)
+                continue
+            queued += 1
+
+        with self._lock:
+            self._stats['queued'] += queued
+        if queued:
+            logger.info(f"Queued {queued} stories for summarization")
+        return queued
+
+    def _release(self, digest, outcome):
+        """Forget a pending content hash and count how its analysis ended"""
+        with self._lock:
+            self._pending.discard(digest)
+            self._stats[outcome] += 1
+
+    def _keep_for_retry(self, feed_url, digest, content):
+        """Remember a skipped story so it is offered again on its feed's next refresh"""
+        with self._lock:
+            skipped = self._retry.setdefault(feed_url, {})
+            skipped[digest] = content
+            if len(skipped) > self.settings['retry_backlog']:
+                # Keep the most recently skipped stories
+                del skipped[next(iter(skipped))]
+
+    def forget_feed(self, feed_url):
+        """Drop the skipped stories kept for a removed feed"""
+        with self._lock:
+            self._retry.pop(feed_url, None)
+
+    def _take_budget(self):
+        """Spend one backend call from the hourly budget; returns False if none is left"""
+        with self._lock:
+            return self._budget.try_take(time.monotonic()) == 0.0
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            feed_url, digest, content = self._queue.get()
+            try:
+                self._analyze(feed_url, digest, content)
+            except Exception as e:
+                logger.error(f"Error in summary worker: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _analyze(self, feed_url, digest, content):
+        """Analyze one story's content, retrying transient failures with exponential backoff"""
+        for attempt in range(self.settings['max_retries'] + 1):
+            if not self._take_budget():
+                logger.warning("Summarization budget exhausted; skipping story until its next refresh")
+                self._release(digest, 'skipped_budget')
+                self._keep_for_retry(feed_url, digest, content)
+                return
+            try:
+                analyze_content(self.settings['api_key'], content)
+                self._release(digest, 'analyzed')
+                return
+            except PERMANENT_ERRORS as e:
+                logger.error(f"Summarization of {digest[:12]} failed permanently: {str(e)}")
+                break
+            except Exception as e:
+                if attempt == self.settings['max_retries']:
+                    logger.error(f"Summarization of {digest[:12]} failed after {attempt + 1} attempts: {str(e)}")
+                    self._release(digest, 'failed')
+                    self._keep_for_retry(feed_url, digest, content)
+                    return
+                wait_time = self.settings['backoff'] * (2 ** attempt)
+                logger.warning(f"Summarization of {digest[:12]} failed (attempt {attempt + 1}), "
+                               f"retrying in {wait_time:.1f}s: {str(e)}")
+                with self._lock:
+                    self._stats['retries'] += 1
+                time.sleep(wait_time)  # Exponential backoff
+        self._release(digest, 'failed')
+
+    def status(self):
+        """Return queue depth, budget left and outcome counters"""
+        with self._lock:
+            self._budget._refill(time.monotonic())
+            return dict(
+                self._stats,
+                enabled=self.settings['enabled'],
+                workers=len(self._workers),
+                queue_depth=self._queue.qsize(),
+                pending=len(self._pending),
+                retry_backlog=sum(len(skipped) for skipped in self._retry.values()),
+                budget_remaining=int(self._budget.tokens)
+            )
+
+# Shared pipeline instance
+summary_pipeline = SummaryPipeline(SUMMARY_SETTINGS)
+
+def summarize_stories(feed_url, stories=()):
+    """Queue a refreshed feed's new stories, and any skipped earlier, for background summarization if it is enabled"""
+    if not SUMMARY_SETTINGS['enabled']:
+        return 0
+    summary_pipeline.start()
+    return summary_pipeline.submit(feed_url, stories)
@@ -0,0 +1,72 @@
+"""Tests for feed validation and ingestion in the News Genie application."""
+
+import feed
+import index
+import store
+from cache import ResponseCache
+from config import DEDUPE_SETTINGS
+from feed import is_valid_rss, store_feed_entries
+from parsing import parse_feed_content, unpack_entries
+
+FEED = ('<?xml version="1.0" encoding="{encoding}"?>\n'
+        '<rss version="2.0"><channel><title>{title}</title><link>http://example.com/</link>'
+        '<item><title>{title}</title><guid>1</guid></item></channel></rss>')
+
+def test_multibyte_declared_encodings_are_valid():
+    for encoding, title in [('gb2312', '新闻'), ('big5', '新聞'), ('shift_jis', 'ニュース'), ('euc-kr', '뉴스')]:
+        assert is_valid_rss(FEED.format(encoding=encoding, title=title).encode(encoding)), encoding
+
+def test_response_encoding_is_used_without_a_declaration():
+    body = '<rss version="2.0"><channel><title>新闻</title></channel></rss>'.encode('gb2312')
+    assert is_valid_rss(body, 'gb2312')
+
+def test_charset_from_content_type_header_is_applied():
+    body = ('<rss version="2.0"><channel><title>Caf\xe9</title><link>http://example.com/</link>'
+            '<item><title>R\xe9sum\xe9</title><guid>1</guid><description>na\xefve</description></item>'
+            '</channel></rss>').encode('windows-1252')
+    assert is_valid_rss(body, 'windows-1252')
+    feed_title, rows, seen, error, _ = parse_feed_content(
+        'http://example.com/feed', '', body, content_type='application/rss+xml; charset=windows-1252'
+    )
+    assert error is None
+    assert feed_title == 'Caf\xe9'
+    assert seen == ('1',)
+    assert rows[0][1] == 'R\xe9sum\xe9'
+
+def test_non_feed_documents_are_rejected():
+    assert not is_valid_rss(b'<!DOCTYPE html><html><body>Not a feed</body></html>')
+    assert not is_valid_rss(b'not xml at all')
+
+def test_root_past_the_sniff_limit_is_rejected():
+    assert not is_valid_rss(b'<?xml version="1.0"?><!--' + b'x' * 20000 + b'--><rss/>')
+
+def parsed_entries(feed_url, titles):
+    """Parse an RSS feed listing the given titles into processed entries and seen IDs"""
+    items = ''.join(f'<item><title>{title}</title><guid>{guid}</guid><description>{title}</description></item>'
+                    for guid, title in titles.items())
+    body = f'<rss version="2.0"><channel><title>Feed</title>{items}</channel></rss>'.encode()
+    _, rows, seen, error, _ = parse_feed_content(feed_url, '', body)
+    assert error is None
+    return unpack_entries(rows), seen
+
+def test_refresh_drops_only_the_cached_responses_of_a_changed_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, '_store', store.StoryStore(str(tmp_path / 'stories.db')))
+    monkeypatch.setattr(index, '_index', None)
+    monkeypatch.setitem(DEDUPE_SETTINGS, 'enabled', False)
+    cache = ResponseCache(10, 60)
+    monkeypatch.setattr(feed, 'response_cache', cache)
+    feed_a, feed_b = 'http://a.example.com/feed', 'http://b.example.com/feed'
+
+    store_feed_entries(feed_a, *parsed_entries(feed_a, {'1': 'First', '2': 'Second'}))
+    cache.put(('stories', 'a'), b'a', cache.generation(), [feed_a])
+    cache.put(('stories', 'b'), b'b', cache.generation(), [feed_b])
+    cache.put(('stories', 'all'), b'all', cache.generation())
+
+    # A refresh that changes nothing keeps every response
+    store_feed_entries(feed_a, [], ('1', '2'))
+    assert all(cache.get(('stories', key)) is not None for key in ('a', 'b', 'all'))
+
+    store_feed_entries(feed_a, *parsed_entries(feed_a, {'1': 'First, updated', '2': 'Second'}))
+    assert cache.get(('stories', 'a')) is None
+    assert cache.get(('stories', 'all')) is None
+    assert cache.get(('stories', 'b')) is not None
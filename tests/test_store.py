@@ -0,0 +1,83 @@
+"""Tests for the story store of the News Genie application."""
+
+import pytest
+
+from store import StoryStore, timeline_key
+
+FEED_A = 'http://a.example.com/feed'
+FEED_B = 'http://b.example.com/feed'
+FEED_C = 'http://c.example.com/feed'
+
+def entry(story_id, published_ts, title=None):
+    """Build a processed feed entry"""
+    title = title or story_id
+    return {'id': story_id, 'title': title, 'link': f'http://example.com/{story_id}', 'description': title,
+            'content': title, 'published': '', 'published_ts': published_ts, 'source': 'Example',
+            'entry_hash': f'{story_id}:{title}'}
+
+def counts(changes):
+    return changes['new'], changes['updated'], changes['unchanged'], changes['expired']
+
+@pytest.fixture
+def story_store(tmp_path):
+    return StoryStore(str(tmp_path / 'stories.db'))
+
+def test_refresh_counts_new_updated_unchanged_and_expired(story_store):
+    changes = story_store.update_feed_stories(FEED_A, [entry('a', 1), entry('b', 2), entry('c', 3)], ['a', 'b', 'c'])
+    assert counts(changes) == (3, 0, 0, 0)
+
+    # b changed, c is listed unchanged, a left the feed and d is new
+    changes = story_store.update_feed_stories(FEED_A, [entry('b', 2, 'b v2'), entry('d', 4)], ['b', 'c', 'd'])
+    assert counts(changes) == (1, 1, 1, 1)
+    assert changes['expired_ids'] == ['a']
+    assert changes['version'] == changes['old_version'] + 1
+
+    changes = story_store.update_feed_stories(FEED_A, [], ['b', 'c', 'd'])
+    assert counts(changes) == (0, 0, 3, 0)
+    assert changes['version'] == changes['old_version']
+
+    stories, total = story_store.get_stories(1, 10, [FEED_A])
+    assert total == 3
+    assert [story.title for story in stories] == ['d', 'c', 'b v2']
+
+def test_vanished_stories_are_kept_for_the_retention_period(story_store):
+    story_store.update_feed_stories(FEED_A, [entry('a', 1), entry('b', 2), entry('c', 3)], ['a', 'b', 'c'])
+
+    changes = story_store.update_feed_stories(FEED_A, [], ['c'], retention=3600)
+    assert counts(changes) == (0, 0, 1, 0)
+    assert story_store.get_stories(1, 10, [FEED_A])[1] == 3
+
+    # Over max_stories, the oldest vanished story is expired before its retention ends
+    changes = story_store.update_feed_stories(FEED_A, [entry('d', 4)], ['c', 'd'], retention=3600, max_stories=3)
+    assert counts(changes) == (1, 0, 1, 1)
+    assert changes['expired_ids'] == ['a']
+    stories, total = story_store.get_stories(1, 10, [FEED_A])
+    assert total == 3
+    assert [story.id for story in stories] == ['d', 'c', 'b']
+
+@pytest.mark.parametrize('feed_urls', [[FEED_A, FEED_B, FEED_C], [FEED_A, FEED_B], [FEED_B, FEED_C]])
+@pytest.mark.parametrize('collapse', [False, True])
+def test_cursor_paging_across_feeds_with_tied_stories(story_store, feed_urls, collapse):
+    # Syndicated copies share their guid and timestamp across feeds
+    story_store.update_feed_stories(FEED_A, [entry('guid-1', 100), entry('a2', 50)], ['guid-1', 'a2'])
+    story_store.update_feed_stories(FEED_B, [entry('guid-1', 100)], ['guid-1'])
+    story_store.update_feed_stories(FEED_C, [entry('guid-1', 100), entry('c2', 150)], ['guid-1', 'c2'])
+
+    expected, total = story_store.get_stories(1, 100, feed_urls, collapse=collapse)
+    expected = [(story.feed_url, story.id) for story in expected]
+    assert len(expected) == total
+
+    walked = []
+    before = None
+    while True:
+        stories, _ = story_store.get_stories(1, 1, feed_urls, before, collapse)
+        if not stories:
+            break
+        walked += [(story.feed_url, story.id) for story in stories]
+        before = timeline_key(stories[-1])
+    assert walked == expected
+
+    numbered = []
+    for page in range(1, total + 1):
+        numbered += [(story.feed_url, story.id) for story in story_store.get_stories(page, 1, feed_urls, collapse=collapse)[0]]
+    assert numbered == expected
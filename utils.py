@@ -1,17 +1,19 @@
 """Utility functions for the News Genie application."""
 
 import logging
+import re
 import sys
-from datetime import datetime
-import time
-from urllib.parse import urlparse
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from html.entities import html5
+from html.parser import HTMLParser
 import nltk
-from bs4 import BeautifulSoup
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from nltk.tokenize import word_tokenize, NLTKWordTokenizer
 from string import punctuation
 
-from config import NLTK_PACKAGES, RATE_LIMIT
+from config import NLTK_DATA_DIR, NLTK_PACKAGES, NLTK_RESOURCES, SEARCH_SETTINGS
 
 # Set up logging
 logging.basicConfig(
@@ -21,56 +23,269 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_nltk():
-    """Download required NLTK data"""
-    try:
-        logger.info("Attempting to download all NLTK data...")
-        nltk.download('all', quiet=True)
-        logger.info("Successfully downloaded all NLTK data")
-    except Exception as e:
-        logger.error(f"Error downloading all NLTK data: {str(e)}")
-        for package in NLTK_PACKAGES:
+# Look for provisioned NLTK resources first; nothing is downloaded at runtime
+if NLTK_DATA_DIR not in nltk.data.path:
+    nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+# English stopwords, loaded once on first use
+_stop_words = None
+_stop_words_lock = threading.Lock()
+
+# Same word tokenizer word_tokenize applies to each sentence
+_word_tokenizer = NLTKWordTokenizer()
+
+# Text made only of these characters tokenizes to a plain whitespace split
+_PLAIN_TEXT = re.compile(r'^[a-z0-9\s]*$')
+
+# Contractions the word tokenizer splits even in plain text (e.g. "cannot", "gonna")
+_PLAIN_CONTRACTIONS = NLTKWordTokenizer.CONTRACTIONS2
+
+_SENTENCE_END_CHARS = '.?!'
+
+# Named character references, resolved like BeautifulSoup does ('amp' -> '&')
+_HTML_ENTITIES = {name[:-1]: char for name, char in html5.items() if name.endswith(';')}
+
+# Whitespace that BeautifulSoup collapses in whitespace-only text nodes
+_ASCII_SPACES = {ord(char): None for char in '\x20\x0a\x09\x0c\x0d'}
+
+class HTMLTextExtractor(HTMLParser):
+    """Collects the text nodes of an HTML fragment in a single pass.
+
+    The nodes are the ones BeautifulSoup's html.parser tree would hold, so
+    joining them gives the same text as get_text(), without building the
+    tree: script, style and template contents, comments and declarations
+    are dropped, CDATA is kept, and whitespace-only nodes outside <pre> and
+    <textarea> become a single space or newline.
+    """
+
+    VOID_ELEMENTS = frozenset([
+        'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr',
+        'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid',
+        'param', 'source', 'spacer', 'track', 'wbr'
+    ])
+    # Elements whose text BeautifulSoup stores as strings get_text() skips
+    HIDDEN_ELEMENTS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+    PRESERVE_WHITESPACE = frozenset(['pre', 'textarea'])
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self._data = []
+        self._open = []
+        self._hidden_depth = 0
+        self._preserve_depth = 0
+        # Void elements closed at their start tag whose end tag should be ignored
+        self._closed_void = []
+
+    def _flush(self, hidden=None):
+        """End the current text node"""
+        if not self._data:
+            return
+        text = ''.join(self._data)
+        self._data = []
+        if hidden is None:
+            hidden = self._hidden_depth > 0
+        if hidden:
+            return
+        if not self._preserve_depth and not text.translate(_ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        self.strings.append(text)
+
+    def handle_starttag(self, tag, attrs, close_void=True):
+        self._flush()
+        self._open.append(tag)
+        if tag in self.HIDDEN_ELEMENTS:
+            self._hidden_depth += 1
+        if tag in self.PRESERVE_WHITESPACE:
+            self._preserve_depth += 1
+        if close_void and tag in self.VOID_ELEMENTS:
+            self._close(tag)
+            self._closed_void.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, close_void=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+            return
+        self._close(tag)
+
+    def _close(self, tag):
+        """Close the most recent open element named `tag` and every element opened inside it"""
+        self._flush()
+        if tag not in self._open:
+            return
+        while True:
+            name = self._open.pop()
+            if name in self.HIDDEN_ELEMENTS:
+                self._hidden_depth -= 1
+            if name in self.PRESERVE_WHITESPACE:
+                self._preserve_depth -= 1
+            if name == tag:
+                return
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in 'xX':
+            codepoint = int(name[1:], 16)
+        else:
+            codepoint = int(name)
+        data = None
+        if codepoint < 256:
+            # References below 256 often mean Windows-1252 characters (&#147; for a left quote)
             try:
-                logger.info(f"Attempting to download NLTK package: {package}")
-                nltk.download(package, quiet=True)
-                logger.info(f"Successfully downloaded {package}")
-            except Exception as e:
-                logger.error(f"Error downloading {package}: {str(e)}")
-
-def check_rate_limit(feed_url):
-    """Check if we need to wait before making a request"""
-    domain = urlparse(feed_url).netloc
-    if domain in RATE_LIMIT:
-        last_request = RATE_LIMIT[domain]['last_request']
-        min_interval = RATE_LIMIT[domain]['min_interval']
-        
-        if last_request:
-            time_since_last = (datetime.now() - last_request).total_seconds()
-            if time_since_last < min_interval:
-                wait_time = min_interval - time_since_last
-                logger.info(f"Rate limiting: waiting {wait_time:.1f} seconds before requesting {feed_url}")
-                time.sleep(wait_time)
-        
-        RATE_LIMIT[domain]['last_request'] = datetime.now()
+                data = bytes([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self._data.append(data or '\N{REPLACEMENT CHARACTER}')
 
-def preprocess_text(text):
-    """Preprocess text by removing HTML, converting to lowercase, and tokenizing"""
+    def handle_entityref(self, name):
+        self._data.append(_HTML_ENTITIES.get(name, f"&{name}"))
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith('CDATA['):
+            self._data.append(data[len('CDATA['):])
+            self._flush(hidden=False)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def extract_text_nodes(html):
+    """Return the text nodes of an HTML fragment"""
+    parser = HTMLTextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.strings
+
+def html_to_text(html):
+    """Return the text content of an HTML fragment, as BeautifulSoup's get_text() would"""
+    return ''.join(extract_text_nodes(html))
+
+def provision_nltk(download_dir=NLTK_DATA_DIR):
+    """Download the NLTK packages the application uses into the NLTK data directory"""
+    success = True
+    for package in NLTK_PACKAGES:
+        try:
+            logger.info(f"Downloading NLTK package {package} to {download_dir}")
+            if not nltk.download(package, download_dir=download_dir, quiet=True):
+                logger.error(f"Could not download {package}")
+                success = False
+        except Exception as e:
+            logger.error(f"Error downloading {package}: {str(e)}")
+            success = False
+    return success
+
+def find_missing_nltk_resources():
+    """Return the runtime NLTK resources that are not available locally"""
+    missing = []
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource)
+    return missing
+
+def get_stopwords():
+    """Return the English stopword set, loading it on first use"""
+    global _stop_words
+    if _stop_words is None:
+        # NLTK's lazy corpus loader is not safe to trigger from several threads at once
+        with _stop_words_lock:
+            if _stop_words is None:
+                _stop_words = frozenset(stopwords.words('english'))
+    return _stop_words
+
+def strip_html(text):
+    """Return the text content of an HTML fragment, joined with single spaces"""
+    return ' '.join(node.strip() for node in extract_text_nodes(text) if node.strip())
+
+def _is_single_sentence(text):
+    """Check whether the sentence splitter could not find a break inside the text"""
+    stripped = text.rstrip()
+    if stripped and stripped[-1] in _SENTENCE_END_CHARS:
+        stripped = stripped[:-1]
+    return not any(char in stripped for char in _SENTENCE_END_CHARS)
+
+def fast_tokenize(text):
+    """Tokenize lowercased text exactly like word_tokenize, skipping work where possible.
+
+    Plain alphanumeric text is split on whitespace, single sentences skip the
+    Punkt sentence splitter, and everything else goes through word_tokenize.
+    """
+    # The word tokenizer pads text with spaces before matching contractions
+    if _PLAIN_TEXT.match(text) and not any(pattern.search(f" {text} ") for pattern in _PLAIN_CONTRACTIONS):
+        return text.split()
+    if _is_single_sentence(text):
+        # The sentence splitter drops trailing whitespace from the last sentence
+        return _word_tokenizer.tokenize(text.rstrip())
+    return word_tokenize(text)
+
+def parse_timestamp(value):
+    """Convert an RFC 822 or ISO 8601 date string to a Unix timestamp (0.0 if unparseable)"""
+    if not value:
+        return 0.0
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def preprocess_text(text, html=True):
+    """Preprocess text by removing HTML, converting to lowercase, and tokenizing.
+
+    Pass html=False for text already reduced to plain text with html_to_text.
+    """
     if not text:
         return []
     
     try:
-        # Remove HTML tags
-        soup = BeautifulSoup(text, 'html.parser', on_duplicate_attribute='ignore')
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Tokenize
-        tokens = word_tokenize(text)
+        if SEARCH_SETTINGS['tokenizer'] == 'fast':
+            # Only parse HTML when the text can contain markup or entities
+            if html and ('<' in text or '&' in text):
+                text = strip_html(text)
+            else:
+                text = text.strip()
+            tokens = fast_tokenize(text.lower())
+        else:
+            # Remove HTML tags (which also trims the text, as is done for plain text)
+            if html:
+                text = strip_html(text)
+            else:
+                text = text.strip()
+            
+            # Convert to lowercase
+            text = text.lower()
+            
+            # Tokenize
+            tokens = word_tokenize(text)
         
         # Remove stopwords and punctuation
-        stop_words = set(stopwords.words('english'))
+        stop_words = get_stopwords()
         tokens = [token for token in tokens 
                   if token not in stop_words 
                   and token not in punctuation]
@@ -78,4 +293,8 @@ def preprocess_text(text):
         return tokens
     except Exception as e:
         logger.error(f"Error preprocessing text: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
+
+def preprocess_texts(texts, html=True):
+    """Preprocess a batch of texts, returning one token list per text"""
+    return [preprocess_text(text, html) for text in texts]